@@ -1,43 +1,113 @@
-# Install uvloop for better async performance
-from uvloop import install
-install()
-
 # Standard library imports
-from asyncio import Lock, new_event_loop, set_event_loop
-from logging import getLogger, FileHandler, StreamHandler, INFO, basicConfig, WARNING, ERROR
+import logging
+from asyncio import Lock, new_event_loop, set_event_loop, set_event_loop_policy
+from atexit import register as atexit_register
+from logging import (
+    getLogger,
+    FileHandler,
+    Formatter,
+    StreamHandler,
+    INFO,
+    basicConfig,
+    WARNING,
+    ERROR,
+)
+from logging.handlers import QueueHandler, QueueListener
 from os import cpu_count
-from time import time
+from queue import SimpleQueue
+from time import localtime, strftime, time
 
 # Third-party imports
+from uvloop import EventLoopPolicy
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from sabnzbdapi import SabnzbdClient
 
-# Performance: Set logging levels early to avoid unnecessary processing
-_loggers_to_silence = [
-    ("requests", WARNING),
-    ("urllib3", WARNING), 
-    ("pyrogram", ERROR),
-    ("httpx", WARNING),
-    ("pymongo", WARNING),
-    ("aiohttp", WARNING),
-]
+# Performance: Set logging levels early so noisy third-party records are
+# dropped by the logger itself, before any handler or formatter work
+SILENCED_LOGGERS = {
+    "requests": WARNING,
+    "urllib3": WARNING,
+    "pyrogram": ERROR,
+    "httpx": WARNING,
+    "pymongo": WARNING,
+    "aiohttp": WARNING,
+}
 
-for logger_name, level in _loggers_to_silence:
-    getLogger(logger_name).setLevel(level)
+for _logger_name, _level in SILENCED_LOGGERS.items():
+    getLogger(_logger_name).setLevel(_level)
 
 # Initialize timing
 bot_start_time = time()
 
-# Create and set event loop with optimizations
+# Create and set event loop, the uvloop policy is installed explicitly right
+# before the loop is created so new_event_loop() always returns a uvloop loop
+set_event_loop_policy(EventLoopPolicy())
 bot_loop = new_event_loop()
 set_event_loop(bot_loop)
 
-# Configure logging with optimized format
-basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[FileHandler("log.txt", buffering=1), StreamHandler()],
-    level=INFO,
+# Configure logging: records are enqueued by the caller and written by a
+# background listener thread into a block-buffered log file
+LOG_FLUSH_INTERVAL = 2
+
+# Skip collecting record fields that the log format never prints
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+logging.logAsyncioTasks = False
+logging._srcfile = None
+
+
+class _CachedTimeFormatter(Formatter):
+    """Formatter that renders the date part of asctime once per second."""
+
+    _last_second = None
+    _last_stamp = ""
+
+    def formatTime(self, record, datefmt=None):
+        second = int(record.created)
+        if second != self._last_second:
+            self._last_second = second
+            self._last_stamp = strftime("%Y-%m-%d %H:%M:%S", localtime(second))
+        return f"{self._last_stamp},{int(record.msecs):03d}"
+
+
+_log_formatter = _CachedTimeFormatter(
+    "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+log_file_handler = FileHandler("log.txt", delay=True)
+log_file_handler.stream = open("log.txt", "a", buffering=65536, encoding="utf-8")
+_stream_handler = StreamHandler()
+for _handler in (log_file_handler, _stream_handler):
+    _handler.setFormatter(_log_formatter)
+
+_log_queue = SimpleQueue()
+_queue_handler = QueueHandler(_log_queue)
+# The queue handler only pre-renders the message, the listener's handlers add
+# the timestamp/name/level prefix
+_queue_handler.setFormatter(Formatter("%(message)s"))
+log_listener = QueueListener(
+    _log_queue, log_file_handler, _stream_handler, respect_handler_level=True
 )
+log_listener.start()
+
+basicConfig(handlers=[_queue_handler], level=INFO)
+
+
+def flush_logs():
+    if log_listener._thread is not None:
+        log_listener.stop()
+    log_file_handler.flush()
+
+
+atexit_register(flush_logs)
+
+
+def _flush_log_file():
+    log_file_handler.flush()
+    bot_loop.call_later(LOG_FLUSH_INTERVAL, _flush_log_file)
+
+
+bot_loop.call_soon(_flush_log_file)
 
 LOGGER = getLogger(__name__)
 cpu_no = cpu_count()
@@ -48,13 +118,19 @@ DOWNLOAD_DIR = "/usr/src/app/downloads/"
 # Initialize data structures with appropriate types for better performance
 intervals = {"status": {}, "qb": "", "jd": "", "nzb": "", "stopAll": False}
 
-# Use dict.fromkeys() for better performance when initializing empty dicts
-_empty_dicts = ["qb_torrents", "jd_downloads", "nzb_jobs", "user_data", 
-                "aria2_options", "qbit_options", "nzb_options", "queued_dl", 
-                "queued_up", "status_dict", "task_dict", "rss_dict", "auth_chats"]
-
-for dict_name in _empty_dicts:
-    globals()[dict_name] = {}
+qb_torrents = {}
+jd_downloads = {}
+nzb_jobs = {}
+user_data = {}
+aria2_options = {}
+qbit_options = {}
+nzb_options = {}
+queued_dl = {}
+queued_up = {}
+status_dict = {}
+task_dict = {}
+rss_dict = {}
+auth_chats = {}
 
 # Initialize lists and sets
 excluded_extensions = ["aria2", "!qB"]
@@ -1,4 +1,4 @@
-from asyncio import gather
+from asyncio import TaskGroup
 from . import LOGGER, bot_loop
 from .core.mltb_client import TgClient
 from .core.config_manager import Config
@@ -7,6 +7,14 @@ from .core.config_manager import Config
 Config.load()
 
 
+async def _optional_service(coro):
+    """Run a startup service whose failure must not abort the boot."""
+    try:
+        await coro
+    except Exception as e:
+        LOGGER.error(f"Optional service failed during startup: {e}")
+
+
 async def main():
     """Optimized main startup function with better error handling and parallelization."""
     try:
@@ -25,10 +33,14 @@ async def main():
         await load_settings()
 
         LOGGER.info("Starting Telegram clients...")
-        await gather(TgClient.start_bot(), TgClient.start_user())
+        async with TaskGroup() as tg:
+            tg.create_task(TgClient.start_bot())
+            tg.create_task(TgClient.start_user())
         
         LOGGER.info("Loading configurations and updating variables...")
-        await gather(load_configurations(), update_variables())
+        async with TaskGroup() as tg:
+            tg.create_task(load_configurations())
+            tg.create_task(update_variables())
 
         # Initialize torrent manager
         LOGGER.info("Initializing torrent manager...")
@@ -36,11 +48,10 @@ async def main():
         await TorrentManager.initiate()
         
         LOGGER.info("Updating download client options...")
-        await gather(
-            update_qb_options(),
-            update_aria2_options(),
-            update_nzb_options(),
-        )
+        async with TaskGroup() as tg:
+            tg.create_task(update_qb_options())
+            tg.create_task(update_aria2_options())
+            tg.create_task(update_nzb_options())
 
         # Import additional services
         from .helper.ext_utils.files_utils import clean_all
@@ -54,24 +65,22 @@ async def main():
         )
 
         LOGGER.info("Starting additional services...")
-        # Group related services for better parallelization
-        core_services = [
-            save_settings(),
-            clean_all(),
-            telegraph.create_account(),
-        ]
-        
-        optional_services = [
-            jdownloader.boot(),
-            initiate_search_tools(),
-            get_packages_version(),
-            restart_notification(),
-            rclone_serve_booter(),
-        ]
-
         # Start core services first, then optional ones
-        await gather(*core_services)
-        await gather(*optional_services, return_exceptions=True)  # Don't fail if optional services fail
+        async with TaskGroup() as tg:
+            tg.create_task(save_settings())
+            tg.create_task(clean_all())
+            tg.create_task(telegraph.create_account())
+
+        # Don't fail if optional services fail
+        async with TaskGroup() as tg:
+            for service in (
+                jdownloader.boot(),
+                initiate_search_tools(),
+                get_packages_version(),
+                restart_notification(),
+                rclone_serve_booter(),
+            ):
+                tg.create_task(_optional_service(service))
 
         LOGGER.info("All services initialized successfully!")
 
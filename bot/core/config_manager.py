@@ -13,11 +13,16 @@ class Config:
     BOT_TOKEN = ""
     CMD_SUFFIX = ""
     DATABASE_URL = ""
+    DATABASE_MAX_POOL_SIZE = 50
+    DATABASE_MIN_POOL_SIZE = 5
     DEFAULT_UPLOAD = "rc"
     EQUAL_SPLITS = False
     EXCLUDED_EXTENSIONS = ""
     FFMPEG_CMDS = {}
     FILELION_API = ""
+    GDRIVE_DOWNLOAD_CHUNK_SIZE = 268435456
+    GDRIVE_DOWNLOAD_WORKERS = 4
+    GDRIVE_LEGACY_DOWNLOAD = False
     GDRIVE_ID = ""
     INCOMPLETE_TASK_NOTIFIER = False
     INDEX_URL = ""
@@ -94,8 +94,7 @@ async def load_settings():
             for key, value in pf_dict.items():
                 if value:
                     file_ = key.replace("__", ".")
-                    async with aiopen(file_, "wb+") as f:
-                        await f.write(value)
+                    await database.restore_file(value, file_)
 
         if a2c_options := await database.db.settings.aria2c.find_one(
             {"_id": BOT_ID}, {"_id": 0}
@@ -114,8 +113,7 @@ async def load_settings():
                 await remove("sabnzbd/SABnzbd.ini.bak")
             ((key, value),) = nzb_opt.items()
             file_ = key.replace("__", ".")
-            async with aiopen(f"sabnzbd/{file_}", "wb+") as f:
-                await f.write(value)
+            await database.restore_file(value, f"sabnzbd/{file_}")
 
         if await database.db.users.find_one():
             for p in ["thumbnails", "tokens", "rclone"]:
@@ -129,16 +127,13 @@ async def load_settings():
                 rclone_config_path = f"rclone/{uid}.conf"
                 token_path = f"tokens/{uid}.pickle"
                 if row.get("THUMBNAIL"):
-                    async with aiopen(thumb_path, "wb+") as f:
-                        await f.write(row["THUMBNAIL"])
+                    await database.restore_file(row["THUMBNAIL"], thumb_path)
                     row["THUMBNAIL"] = thumb_path
                 if row.get("RCLONE_CONFIG"):
-                    async with aiopen(rclone_config_path, "wb+") as f:
-                        await f.write(row["RCLONE_CONFIG"])
+                    await database.restore_file(row["RCLONE_CONFIG"], rclone_config_path)
                     row["RCLONE_CONFIG"] = rclone_config_path
                 if row.get("TOKEN_PICKLE"):
-                    async with aiopen(token_path, "wb+") as f:
-                        await f.write(row["TOKEN_PICKLE"])
+                    await database.restore_file(row["TOKEN_PICKLE"], token_path)
                     row["TOKEN_PICKLE"] = token_path
                 user_data[uid] = row
             LOGGER.info("Users data has been imported from Database")
@@ -166,11 +161,7 @@ async def save_settings():
     if await database.db.settings.qbittorrent.find_one({"_id": TgClient.ID}) is None:
         await database.save_qbit_settings()
     if await database.db.settings.nzb.find_one({"_id": TgClient.ID}) is None:
-        async with aiopen("sabnzbd/SABnzbd.ini", "rb+") as pf:
-            nzb_conf = await pf.read()
-        await database.db.settings.nzb.update_one(
-            {"_id": TgClient.ID}, {"$set": {"SABnzbd__ini": nzb_conf}}, upsert=True
-        )
+        await database.update_nzb_config()
 
 
 async def update_variables():
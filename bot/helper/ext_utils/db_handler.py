@@ -1,352 +1,469 @@
 from aiofiles import open as aiopen
+from asyncio import create_task, gather, get_running_loop, shield, sleep
 from aiofiles.os import path as aiopath
+from bson import ObjectId
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from gridfs import AsyncGridFSBucket
+from gridfs.errors import NoFile
 from importlib import import_module
-from pymongo import AsyncMongoClient
+from pymongo import AsyncMongoClient, DeleteOne, ReplaceOne
 from pymongo.server_api import ServerApi
-from pymongo.errors import PyMongoError
 
 from ... import LOGGER, user_data, rss_dict, qbit_options
-from ...core.mltb_client import TgClient
 from ...core.config_manager import Config
 from .local_db_handler import LocalDbManager
 from .supabase_db_handler import SupabaseDbManager
 
 
-class DbManager:
-    def __init__(self):
-        self._return = True
-        self._conn = None
-        self.db = None
-        self._local_db = None
-        self._supabase_db = None
-        self._use_local = False
-        self._use_supabase = False
+class _NullBackend:
+    """Backend used while no database is connected, every call is a no-op."""
 
-    async def connect(self):
-        # Priority order: Supabase -> MongoDB -> SQLite
-        
-        # Try Supabase first if configured
-        if Config.SUPABASE_URL and Config.SUPABASE_SERVICE_KEY:
-            try:
-                LOGGER.info("Attempting to connect to Supabase database")
-                self._supabase_db = SupabaseDbManager()
-                await self._supabase_db.connect()
-                if not self._supabase_db._return:
-                    self.db = self._supabase_db.db
-                    self._return = False
-                    self._use_supabase = True
-                    LOGGER.info("Successfully connected to Supabase database")
-                    return
-                else:
-                    LOGGER.warning("Supabase connection failed, trying next option")
-            except Exception as e:
-                LOGGER.error(f"Error connecting to Supabase: {e}")
-                LOGGER.info("Falling back to next database option")
+    async def _noop(self, *args, **kwargs):
+        return None
+
+    async def get_incomplete_tasks(self):
+        return {}
+
+    def __getattr__(self, name):
+        return self._noop
+
+
+_NULL_BACKEND = _NullBackend()
+
+# Binary user documents, written only through update_user_doc
+_USER_DOC_KEYS = ("THUMBNAIL", "RCLONE_CONFIG", "TOKEN_PICKLE")
+
+# Read/write size used when streaming files to and from GridFS
+GRIDFS_CHUNK_SIZE = 256 * 1024
+
+
+class _WriteCoalescer:
+    """Collects small writes for a short window and sends them per collection
+    with one ordered bulk_write, each submitter awaits its own future."""
 
-        # Try MongoDB if DATABASE_URL is provided
-        if Config.DATABASE_URL and not self._use_supabase:
+    def __init__(self, window=0.02, max_ops=500):
+        self._window = window
+        self._max_ops = max_ops
+        self._pending = []
+        self._worker = None
+
+    def submit(self, collection, op):
+        future = get_running_loop().create_future()
+        self._pending.append((collection, op, future))
+        if self._worker is None:
+            self._worker = create_task(self._run())
+        return future
+
+    async def drain(self):
+        if self._worker is not None:
+            await shield(self._worker)
+
+    async def _run(self):
+        try:
+            while self._pending:
+                await sleep(self._window)
+                batch = self._pending[: self._max_ops]
+                del self._pending[: self._max_ops]
+                await self._flush(batch)
+        finally:
+            self._worker = None
+
+    @staticmethod
+    async def _flush(batch):
+        groups = {}
+        for collection, op, future in batch:
+            group = groups.setdefault(collection.full_name, (collection, [], []))
+            group[1].append(op)
+            group[2].append(future)
+        for collection, ops, futures in groups.values():
+            # Ordered, so an add and a remove of the same task keep their order
             try:
-                LOGGER.info("Attempting to connect to MongoDB database")
-                if self._conn is not None:
-                    await self._conn.close()
-                self._conn = AsyncMongoClient(
-                    Config.DATABASE_URL, server_api=ServerApi("1")
-                )
-                self.db = self._conn.mltb
-                self._return = False
-                LOGGER.info("Successfully connected to MongoDB database")
-                return
-            except PyMongoError as e:
-                LOGGER.error(f"Error in MongoDB connection: {e}")
-                LOGGER.info("Falling back to local SQLite database")
+                await collection.bulk_write(ops, ordered=True)
+            except Exception as e:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for future in futures:
+                    if not future.done():
+                        future.set_result(None)
 
-        # Fall back to SQLite
-        LOGGER.info("Using local SQLite database as fallback")
-        self._use_local = True
-        self._local_db = LocalDbManager()
-        await self._local_db.connect()
-        self.db = self._local_db.db
-        self._return = self._local_db._return
-        if self._conn:
-            await self._conn.close()
-            self._conn = None
 
-    async def disconnect(self):
-        self._return = True
-        if self._use_supabase and self._supabase_db:
-            await self._supabase_db.disconnect()
-        elif self._use_local and self._local_db:
-            await self._local_db.disconnect()
-        elif self._conn is not None:
-            await self._conn.close()
-        self._conn = None
+class _MongoBackend:
+    def __init__(self, db):
+        self.db = db
+        # connect() runs before the bot client starts, so derive the id the
+        # same way TgClient.start_bot does instead of reading TgClient.ID
+        self._bot_id = Config.BOT_TOKEN.split(":", 1)[0]
+        # pymongo never mutates filters, so the same dict is reused per call
+        self._id_filter = {"_id": self._bot_id}
+        self._settings = db.settings
+        self._deploy_config = self._settings.deployConfig
+        self._config = self._settings.config
+        self._aria2c = self._settings.aria2c
+        self._qbittorrent = self._settings.qbittorrent
+        self._files = self._settings.files
+        self._nzb = self._settings.nzb
+        self._users = db.users
+        self._rss = db.rss[self._bot_id]
+        self._tasks = db.tasks[self._bot_id]
+        self._raw_tasks = self._tasks.with_options(
+            codec_options=CodecOptions(document_class=RawBSONDocument)
+        )
+        self._fs = AsyncGridFSBucket(db)
+        self._writes = _WriteCoalescer()
+        # user_id -> keys written by update_user_data, used to $unset the
+        # settings that were removed since the previous write
+        self._user_keys = {}
 
     async def update_deploy_config(self):
-        if self._return:
-            return
-        if self._use_supabase:
-            await self._supabase_db.update_deploy_config()
-            return
-        if self._use_local:
-            await self._local_db.update_deploy_config()
-            return
         settings = import_module("config")
         config_file = {
             key: value.strip() if isinstance(value, str) else value
             for key, value in vars(settings).items()
             if not key.startswith("__")
         }
-        await self.db.settings.deployConfig.replace_one(
-            {"_id": TgClient.ID}, config_file, upsert=True
+        await self._deploy_config.replace_one(
+            self._id_filter, config_file, upsert=True
         )
 
     async def update_config(self, dict_):
-        if self._return:
-            return
-        if self._use_supabase:
-            await self._supabase_db.update_config(dict_)
-            return
-        if self._use_local:
-            await self._local_db.update_config(dict_)
-            return
-        await self.db.settings.config.update_one(
-            {"_id": TgClient.ID}, {"$set": dict_}, upsert=True
+        await self._config.update_one(
+            self._id_filter, {"$set": dict_}, upsert=True
         )
 
     async def update_aria2(self, key, value):
-        if self._return:
-            return
-        if self._use_supabase:
-            await self._supabase_db.update_aria2(key, value)
-            return
-        if self._use_local:
-            await self._local_db.update_aria2(key, value)
-            return
-        await self.db.settings.aria2c.update_one(
-            {"_id": TgClient.ID}, {"$set": {key: value}}, upsert=True
+        await self._aria2c.update_one(
+            self._id_filter, {"$set": {key: value}}, upsert=True
         )
 
     async def update_qbittorrent(self, key, value):
-        if self._return:
-            return
-        if self._use_supabase:
-            await self._supabase_db.update_qbittorrent(key, value)
-            return
-        if self._use_local:
-            await self._local_db.update_qbittorrent(key, value)
-            return
-        await self.db.settings.qbittorrent.update_one(
-            {"_id": TgClient.ID}, {"$set": {key: value}}, upsert=True
+        await self._qbittorrent.update_one(
+            self._id_filter, {"$set": {key: value}}, upsert=True
         )
 
     async def save_qbit_settings(self):
-        if self._return:
-            return
-        if self._use_supabase:
-            await self._supabase_db.save_qbit_settings()
-            return
-        if self._use_local:
-            await self._local_db.save_qbit_settings()
-            return
-        await self.db.settings.qbittorrent.update_one(
-            {"_id": TgClient.ID}, {"$set": qbit_options}, upsert=True
+        await self._qbittorrent.update_one(
+            self._id_filter, {"$set": qbit_options}, upsert=True
         )
 
+    async def _upload_file(self, file_id, path):
+        """Store path as a new GridFS version named file_id and return its id.
+        Older versions stay until the caller has pointed its document at the
+        new one and removes them with _delete_file."""
+        new_id = ObjectId()
+        async with aiopen(path, "rb") as f:
+            async with self._fs.open_upload_stream_with_id(new_id, file_id) as grid_in:
+                while chunk := await f.read(GRIDFS_CHUNK_SIZE):
+                    await grid_in.write(chunk)
+        return new_id
+
+    async def _delete_file(self, file_id, keep=None):
+        """Remove the stored versions of file_id except keep, this also
+        covers files stored with file_id itself as GridFS id"""
+        async for grid_out in self._fs.find(
+            {"filename": file_id, "_id": {"$ne": keep}}
+        ):
+            try:
+                await self._fs.delete(grid_out._id)
+            except NoFile:
+                pass
+
+    async def restore_file(self, value, path):
+        # Older databases store the file content inline, newer ones store
+        # the id of a GridFS file
+        async with aiopen(path, "wb+") as f:
+            if isinstance(value, bytes):
+                await f.write(value)
+                return
+            grid_out = await self._fs.open_download_stream(value)
+            while chunk := await grid_out.readchunk():
+                await f.write(chunk)
+
     async def update_private_file(self, path):
-        if self._return:
-            return
-        if self._use_supabase:
-            await self._supabase_db.update_private_file(path)
-            return
-        if self._use_local:
-            await self._local_db.update_private_file(path)
-            return
         db_path = path.replace(".", "__")
+        file_id = f"{self._bot_id}/{db_path}"
         if await aiopath.exists(path):
-            async with aiopen(path, "rb+") as pf:
-                pf_bin = await pf.read()
-            await self.db.settings.files.update_one(
-                {"_id": TgClient.ID}, {"$set": {db_path: pf_bin}}, upsert=True
+            grid_id = await self._upload_file(file_id, path)
+            await self._files.update_one(
+                self._id_filter, {"$set": {db_path: grid_id}}, upsert=True
             )
+            await self._delete_file(file_id, keep=grid_id)
             if path == "config.py":
                 await self.update_deploy_config()
         else:
-            await self.db.settings.files.update_one(
-                {"_id": TgClient.ID}, {"$unset": {db_path: ""}}, upsert=True
+            await self._files.update_one(
+                self._id_filter, {"$unset": {db_path: ""}}, upsert=True
             )
+            await self._delete_file(file_id)
 
     async def update_nzb_config(self):
-        if self._return:
-            return
-        if self._use_supabase:
-            await self._supabase_db.update_nzb_config()
-            return
-        if self._use_local:
-            await self._local_db.update_nzb_config()
-            return
-        async with aiopen("sabnzbd/SABnzbd.ini", "rb+") as pf:
-            nzb_conf = await pf.read()
-        await self.db.settings.nzb.replace_one(
-            {"_id": TgClient.ID}, {"SABnzbd__ini": nzb_conf}, upsert=True
+        file_id = f"{self._bot_id}/SABnzbd__ini"
+        grid_id = await self._upload_file(file_id, "sabnzbd/SABnzbd.ini")
+        await self._nzb.replace_one(
+            self._id_filter, {"SABnzbd__ini": grid_id}, upsert=True
         )
+        await self._delete_file(file_id, keep=grid_id)
 
     async def update_user_data(self, user_id):
-        if self._return:
-            return
-        if self._use_supabase:
-            await self._supabase_db.update_user_data(user_id)
-            return
-        if self._use_local:
-            await self._local_db.update_user_data(user_id)
-            return
-        data = user_data.get(user_id, {})
-        data = data.copy()
-        for key in ("THUMBNAIL", "RCLONE_CONFIG", "TOKEN_PICKLE"):
-            data.pop(key, None)
-        pipeline = [
-            {
-                "$replaceRoot": {
-                    "newRoot": {
-                        "$mergeObjects": [
-                            data,
-                            {
-                                "$arrayToObject": {
-                                    "$filter": {
-                                        "input": {"$objectToArray": "$$ROOT"},
-                                        "as": "field",
-                                        "cond": {
-                                            "$in": [
-                                                "$$field.k",
-                                                [
-                                                    "THUMBNAIL",
-                                                    "RCLONE_CONFIG",
-                                                    "TOKEN_PICKLE",
-                                                ],
-                                            ]
-                                        },
+        data = {
+            key: value
+            for key, value in user_data.get(user_id, {}).items()
+            if key not in _USER_DOC_KEYS
+        }
+        stored_keys = self._user_keys.get(user_id)
+        if stored_keys is None:
+            # Stored layout is unknown until the first write of this process,
+            # let the server drop stale keys while keeping the user documents
+            update = [
+                {
+                    "$replaceRoot": {
+                        "newRoot": {
+                            "$mergeObjects": [
+                                data,
+                                {
+                                    "$arrayToObject": {
+                                        "$filter": {
+                                            "input": {"$objectToArray": "$$ROOT"},
+                                            "as": "field",
+                                            "cond": {
+                                                "$in": [
+                                                    "$$field.k",
+                                                    list(_USER_DOC_KEYS),
+                                                ]
+                                            },
+                                        }
                                     }
-                                }
-                            },
-                        ]
+                                },
+                            ]
+                        }
                     }
                 }
-            }
-        ]
-        await self.db.users.update_one({"_id": user_id}, pipeline, upsert=True)
+            ]
+        else:
+            update = {}
+            if data:
+                update["$set"] = data
+            if removed := stored_keys.difference(data):
+                update["$unset"] = dict.fromkeys(removed, "")
+        if update:
+            await self._users.update_one({"_id": user_id}, update, upsert=True)
+        self._user_keys[user_id] = set(data)
 
     async def update_user_doc(self, user_id, key, path=""):
-        if self._return:
-            return
-        if self._use_supabase:
-            await self._supabase_db.update_user_doc(user_id, key, path)
-            return
-        if self._use_local:
-            await self._local_db.update_user_doc(user_id, key, path)
-            return
+        file_id = f"{user_id}/{key}"
         if path:
-            async with aiopen(path, "rb+") as doc:
-                doc_bin = await doc.read()
-            await self.db.users.update_one(
-                {"_id": user_id}, {"$set": {key: doc_bin}}, upsert=True
+            grid_id = await self._upload_file(file_id, path)
+            await self._users.update_one(
+                {"_id": user_id}, {"$set": {key: grid_id}}, upsert=True
             )
+            await self._delete_file(file_id, keep=grid_id)
         else:
-            await self.db.users.update_one(
+            await self._users.update_one(
                 {"_id": user_id}, {"$unset": {key: ""}}, upsert=True
             )
+            await self._delete_file(file_id)
 
     async def rss_update_all(self):
-        if self._return:
-            return
-        if self._use_supabase:
-            await self._supabase_db.rss_update_all()
-            return
-        if self._use_local:
-            await self._local_db.rss_update_all()
-            return
-        for user_id in list(rss_dict.keys()):
-            await self.db.rss[TgClient.ID].replace_one(
-                {"_id": user_id}, rss_dict[user_id], upsert=True
-            )
+        await self._writes.drain()
+        ops = [
+            ReplaceOne({"_id": user_id}, rss_data, upsert=True)
+            for user_id, rss_data in list(rss_dict.items())
+        ]
+        if ops:
+            await self._rss.bulk_write(ops, ordered=False)
 
     async def rss_update(self, user_id):
-        if self._return:
-            return
-        if self._use_supabase:
-            await self._supabase_db.rss_update(user_id)
-            return
-        if self._use_local:
-            await self._local_db.rss_update(user_id)
-            return
-        await self.db.rss[TgClient.ID].replace_one(
-            {"_id": user_id}, rss_dict[user_id], upsert=True
+        await self._writes.submit(
+            self._rss, ReplaceOne({"_id": user_id}, rss_dict[user_id], upsert=True)
         )
 
     async def rss_delete(self, user_id):
-        if self._return:
-            return
-        if self._use_supabase:
-            await self._supabase_db.rss_delete(user_id)
-            return
-        if self._use_local:
-            await self._local_db.rss_delete(user_id)
-            return
-        await self.db.rss[TgClient.ID].delete_one({"_id": user_id})
+        await self._writes.submit(self._rss, DeleteOne({"_id": user_id}))
 
     async def add_incomplete_task(self, cid, link, tag):
-        if self._return:
-            return
-        if self._use_supabase:
-            await self._supabase_db.add_incomplete_task(cid, link, tag)
-            return
-        if self._use_local:
-            await self._local_db.add_incomplete_task(cid, link, tag)
-            return
-        await self.db.tasks[TgClient.ID].insert_one(
-            {"_id": link, "cid": cid, "tag": tag}
+        await self._writes.submit(
+            self._tasks,
+            ReplaceOne({"_id": link}, {"cid": cid, "tag": tag}, upsert=True),
         )
 
     async def rm_complete_task(self, link):
-        if self._return:
-            return
-        if self._use_supabase:
-            await self._supabase_db.rm_complete_task(link)
-            return
-        if self._use_local:
-            await self._local_db.rm_complete_task(link)
-            return
-        await self.db.tasks[TgClient.ID].delete_one({"_id": link})
+        await self._writes.submit(self._tasks, DeleteOne({"_id": link}))
 
     async def get_incomplete_tasks(self):
+        await self._writes.drain()
         notifier_dict = {}
-        if self._return:
-            return notifier_dict
-        if self._use_supabase:
-            return await self._supabase_db.get_incomplete_tasks()
-        if self._use_local:
-            return await self._local_db.get_incomplete_tasks()
-        if await self.db.tasks[TgClient.ID].find_one():
-            rows = self.db.tasks[TgClient.ID].find({})
-            async for row in rows:
-                if row["cid"] in list(notifier_dict.keys()):
-                    if row["tag"] in list(notifier_dict[row["cid"]]):
-                        notifier_dict[row["cid"]][row["tag"]].append(row["_id"])
-                    else:
-                        notifier_dict[row["cid"]][row["tag"]] = [row["_id"]]
-                else:
-                    notifier_dict[row["cid"]] = {row["tag"]: [row["_id"]]}
-        await self.db.tasks[TgClient.ID].drop()
+        # Only _id, cid and tag are needed, project them and keep rows raw
+        rows = self._raw_tasks.find({}, {"cid": 1, "tag": 1})
+        async for row in rows:
+            cid_tasks = notifier_dict.setdefault(row["cid"], {})
+            cid_tasks.setdefault(row["tag"], []).append(row["_id"])
+        await self._tasks.drop()
         return notifier_dict
 
     async def trunc_table(self, name):
-        if self._return:
-            return
-        if self._use_supabase:
-            await self._supabase_db.trunc_table(name)
+        await self._writes.drain()
+        await self.db[name][self._bot_id].drop()
+
+
+class DbManager:
+    def __init__(self):
+        self._return = True
+        self._conn = None
+        self.db = None
+        self._local_db = None
+        self._supabase_db = None
+        self._use_local = False
+        self._use_supabase = False
+        self._backend = _NULL_BACKEND
+
+    async def _try_supabase(self):
+        if not (Config.SUPABASE_URL and Config.SUPABASE_SERVICE_KEY):
+            return None
+        try:
+            LOGGER.info("Attempting to connect to Supabase database")
+            supabase_db = SupabaseDbManager()
+            await supabase_db.connect()
+            if not supabase_db._return:
+                return supabase_db
+            LOGGER.warning("Supabase connection failed, trying next option")
+        except Exception as e:
+            LOGGER.error(f"Error connecting to Supabase: {e}")
+            LOGGER.info("Falling back to next database option")
+        return None
+
+    async def _try_mongo(self):
+        if not Config.DATABASE_URL:
+            return None
+        conn = None
+        try:
+            LOGGER.info("Attempting to connect to MongoDB database")
+            conn = AsyncMongoClient(
+                Config.DATABASE_URL,
+                server_api=ServerApi("1"),
+                maxPoolSize=Config.DATABASE_MAX_POOL_SIZE,
+                minPoolSize=Config.DATABASE_MIN_POOL_SIZE,
+                maxIdleTimeMS=300000,
+                serverSelectionTimeoutMS=5000,
+                retryWrites=True,
+                w="majority",
+                compressors="zlib",
+            )
+            await conn.admin.command("ping")
+            return conn
+        except Exception as e:
+            # Which fallback is used is decided and logged by connect()
+            LOGGER.error(f"Error in MongoDB connection: {e}")
+            if conn is not None:
+                await conn.close()
+        return None
+
+    async def connect(self):
+        # Priority order: Supabase -> MongoDB -> SQLite
+        self._backend = _NULL_BACKEND
+        self._use_local = False
+        self._use_supabase = False
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+        # Supabase and MongoDB are probed concurrently so a slow Supabase
+        # doesn't delay the MongoDB fallback, Supabase still wins if both work
+        supabase_db, conn = await gather(self._try_supabase(), self._try_mongo())
+
+        if supabase_db is not None:
+            if conn is not None:
+                await conn.close()
+            self._supabase_db = supabase_db
+            self.db = supabase_db.db
+            self._return = False
+            self._use_supabase = True
+            self._backend = supabase_db
+            LOGGER.info("Successfully connected to Supabase database")
             return
-        if self._use_local:
-            await self._local_db.trunc_table(name)
+
+        if conn is not None:
+            self._conn = conn
+            self.db = conn.mltb
+            self._return = False
+            self._backend = _MongoBackend(self.db)
+            LOGGER.info(
+                f"Successfully connected to MongoDB database (pool size: {Config.DATABASE_MIN_POOL_SIZE}-{Config.DATABASE_MAX_POOL_SIZE})"
+            )
             return
-        await self.db[name][TgClient.ID].drop()
+
+        # Fall back to SQLite
+        LOGGER.info("Using local SQLite database as fallback")
+        self._use_local = True
+        self._local_db = LocalDbManager()
+        await self._local_db.connect()
+        self.db = self._local_db.db
+        self._return = self._local_db._return
+        if not self._return:
+            self._backend = self._local_db
+
+    async def disconnect(self):
+        self._return = True
+        self._backend = _NULL_BACKEND
+        if self._use_supabase and self._supabase_db:
+            await self._supabase_db.disconnect()
+        elif self._use_local and self._local_db:
+            await self._local_db.disconnect()
+        elif self._conn is not None:
+            await self._conn.close()
+        self._conn = None
+
+    async def update_deploy_config(self):
+        await self._backend.update_deploy_config()
+
+    async def update_config(self, dict_):
+        await self._backend.update_config(dict_)
+
+    async def update_aria2(self, key, value):
+        await self._backend.update_aria2(key, value)
+
+    async def update_qbittorrent(self, key, value):
+        await self._backend.update_qbittorrent(key, value)
+
+    async def save_qbit_settings(self):
+        await self._backend.save_qbit_settings()
+
+    async def update_private_file(self, path):
+        await self._backend.update_private_file(path)
+
+    async def update_nzb_config(self):
+        await self._backend.update_nzb_config()
+
+    async def update_user_data(self, user_id):
+        await self._backend.update_user_data(user_id)
+
+    async def update_user_doc(self, user_id, key, path=""):
+        await self._backend.update_user_doc(user_id, key, path)
+
+    async def restore_file(self, value, path):
+        await self._backend.restore_file(value, path)
+
+    async def rss_update_all(self):
+        await self._backend.rss_update_all()
+
+    async def rss_update(self, user_id):
+        await self._backend.rss_update(user_id)
+
+    async def rss_delete(self, user_id):
+        await self._backend.rss_delete(user_id)
+
+    async def add_incomplete_task(self, cid, link, tag):
+        await self._backend.add_incomplete_task(cid, link, tag)
+
+    async def rm_complete_task(self, link):
+        await self._backend.rm_complete_task(link)
+
+    async def get_incomplete_tasks(self):
+        return await self._backend.get_incomplete_tasks()
+
+    async def trunc_table(self, name):
+        await self._backend.trunc_table(name)
 
 
 database = DbManager()
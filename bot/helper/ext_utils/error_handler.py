@@ -4,10 +4,12 @@ Optimized error handling utility with retry mechanisms and circuit breakers.
 
 import asyncio
 import functools
+from asyncio import get_running_loop
 import logging
 from typing import Any, Callable, Optional, Type, Union, Tuple
-from time import time
-from collections import defaultdict
+from time import monotonic as time
+from random import random as _rand
+from collections import defaultdict, deque
 
 logger = logging.getLogger(__name__)
 
@@ -23,12 +25,23 @@ class CircuitBreaker:
         self.failure_count = 0
         self.last_failure_time = None
         self.state = 'CLOSED'  # CLOSED, OPEN, HALF_OPEN
+        # CLOSED with no recorded failures, successes have nothing to reset
+        self._healthy = True
     
     def __call__(self, func: Callable) -> Callable:
         @functools.wraps(func)
         async def wrapper(*args, **kwargs):
+            if self._healthy:
+                try:
+                    return await func(*args, **kwargs)
+                except self.expected_exception:
+                    self._on_failure()
+                    raise
+            
             if self.state == 'OPEN':
-                if time() - self.last_failure_time < self.recovery_timeout:
+                # The running loop's clock is monotonic and already cached
+                now = get_running_loop().time()
+                if now - self.last_failure_time < self.recovery_timeout:
                     raise Exception("Circuit breaker is OPEN")
                 else:
                     self.state = 'HALF_OPEN'
@@ -47,11 +60,13 @@ class CircuitBreaker:
         """Reset failure count on success."""
         self.failure_count = 0
         self.state = 'CLOSED'
+        self._healthy = True
     
     def _on_failure(self):
         """Increment failure count and potentially open circuit."""
+        self._healthy = False
         self.failure_count += 1
-        self.last_failure_time = time()
+        self.last_failure_time = get_running_loop().time()
         
         if self.failure_count >= self.failure_threshold:
             self.state = 'OPEN'
@@ -83,6 +98,7 @@ def retry_async(config: Optional[RetryConfig] = None,
         @functools.wraps(func)
         async def wrapper(*args, **kwargs):
             last_exception = None
+            last_attempt = config.max_attempts - 1
             
             for attempt in range(config.max_attempts):
                 try:
@@ -90,7 +106,7 @@ def retry_async(config: Optional[RetryConfig] = None,
                 except exceptions as e:
                     last_exception = e
                     
-                    if attempt == config.max_attempts - 1:
+                    if attempt == last_attempt:
                         # Last attempt, don't wait
                         break
                     
@@ -102,8 +118,7 @@ def retry_async(config: Optional[RetryConfig] = None,
                     
                     # Add jitter to prevent thundering herd
                     if config.jitter:
-                        import random
-                        delay *= (0.5 + random.random() * 0.5)
+                        delay *= (0.5 + _rand() * 0.5)
                     
                     logger.warning(f"Attempt {attempt + 1} failed for {func.__name__}: {e}. "
                                  f"Retrying in {delay:.2f}s...")
@@ -218,25 +233,25 @@ class RateLimiter:
     def __init__(self, max_calls: int, time_window: int):
         self.max_calls = max_calls
         self.time_window = time_window
-        self.calls = []
+        self.calls = deque(maxlen=max_calls)
     
     async def acquire(self):
         """Acquire permission to make a call."""
-        now = time()
+        now = get_running_loop().time()
+        calls = self.calls
         
-        # Remove old calls outside time window
-        self.calls = [call_time for call_time in self.calls 
-                     if now - call_time < self.time_window]
+        # Remove old calls outside time window, oldest first
+        while calls and now - calls[0] >= self.time_window:
+            calls.popleft()
         
-        if len(self.calls) >= self.max_calls:
-            # Calculate wait time
-            oldest_call = min(self.calls)
-            wait_time = self.time_window - (now - oldest_call)
+        if len(calls) >= self.max_calls:
+            # Calculate wait time until the oldest call leaves the window
+            wait_time = self.time_window - (now - calls[0])
             
             if wait_time > 0:
                 await asyncio.sleep(wait_time)
         
-        self.calls.append(now)
+        calls.append(now)
 
 
 def rate_limited(max_calls: int, time_window: int):
@@ -1,21 +1,329 @@
 import sqlite3
 import os
+from math import ceil, log
 import hashlib
+from asyncio import get_running_loop
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import cache, partial
 from logging import getLogger
 from datetime import datetime
-from typing import Optional, List, Dict, Tuple
+from queue import Empty, Queue, SimpleQueue
+from threading import Lock, Thread
+from time import monotonic, time as _now
+from typing import Optional, List, Dict, Iterable, Iterator, Tuple
 
 LOGGER = getLogger(__name__)
 
+# Read-only connections kept open for the lookup methods
+READ_POOL_SIZE = 4
+STATEMENT_CACHE_SIZE = 256
+# Values bound per IN (...) query of check_duplicates_bulk, shorter chunks
+# are padded to a power of two from BULK_LOOKUP_MIN so only a few statement
+# shapes are ever prepared
+BULK_LOOKUP_CHUNK = 512
+BULK_LOOKUP_MIN = 8
+# Rows queued with queue_file_hash are written in batches of up to this many,
+# a queued row waits at most WRITE_BATCH_DELAY seconds
+WRITE_BATCH_SIZE = 100
+WRITE_BATCH_DELAY = 1.0
+
+# Read size used when hashing local files
+HASH_CHUNK_SIZE = 1 << 20
+
+# Sizing of the file_id and digest Bloom filters, they are rebuilt twice as
+# large when either is full
+BLOOM_CAPACITY = 1 << 20
+BLOOM_ERROR_RATE = 1e-4
+
+HASH_TYPES = ('md5', 'sha1')
+
+# Bumped whenever _migrate_schema gains a step
+SCHEMA_VERSION = 3
+
+# Applied to every connection, WAL lets the readers run alongside the writer
+_CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA foreign_keys = ON",
+)
+_WRITER_PRAGMAS = (
+    "PRAGMA journal_size_limit = 67108864",
+    "PRAGMA wal_autocheckpoint = 1000",
+)
+
+
+def _hash_to_blob(value):
+    """Pack a hex digest into raw bytes for storage"""
+    if isinstance(value, str):
+        try:
+            return bytes.fromhex(value)
+        except ValueError:
+            return value
+    return value
+
+
+def _hash_to_hex(value):
+    """Render a stored digest back as a hex string"""
+    return value.hex() if isinstance(value, bytes) else value
+
+
+def _hash_key(hash_type: str, value) -> str:
+    """Bloom filter key of a digest, hex input and stored bytes map alike"""
+    return f"{hash_type}:{_hash_to_hex(_hash_to_blob(value))}"
+
+
+@cache
+def _in_query(template: str, size: int) -> str:
+    """Fill the IN (...) list of template with size placeholders"""
+    return template.format(",".join("?" * size))
+
+
+def _padded(values: List) -> Tuple[List, int]:
+    """Pad an IN (...) chunk with NULLs, which match no row, to its bucket size"""
+    size = max(BULK_LOOKUP_MIN, 1 << (len(values) - 1).bit_length())
+    return values + [None] * (size - len(values)), size
+
+
+def _from_epoch(value):
+    """Turn a stored epoch second back into a datetime for callers"""
+    return datetime.fromtimestamp(value) if isinstance(value, int) else value
+
+
+def compute_hashes(path: str, algos: Iterable[str] = HASH_TYPES,
+                   chunk_size: int = HASH_CHUNK_SIZE) -> Dict[str, str]:
+    """Hash a file in one streaming pass, returns {algo: hex digest}"""
+    algos = tuple(algos)
+    with open(path, 'rb', buffering=0) as f:
+        if len(algos) == 1:
+            return {algos[0]: hashlib.file_digest(f, algos[0]).hexdigest()}
+        hashers = [hashlib.new(algo) for algo in algos]
+        buf = bytearray(chunk_size)
+        view = memoryview(buf)
+        while size := f.readinto(buf):
+            chunk = view[:size]
+            for hasher in hashers:
+                hasher.update(chunk)
+    return {algo: hasher.hexdigest() for algo, hasher in zip(algos, hashers)}
+
+
+def _join_groups(ref: str) -> str:
+    """Trigger body adding file row ref to its hash values and groups"""
+    return "".join(
+        f"INSERT INTO file_hash_values (file_id, hash_type, hash_value) "
+        f"SELECT {ref}.file_id, '{t}', {ref}.{t}_hash WHERE {ref}.{t}_hash IS NOT NULL; "
+        f"INSERT INTO duplicate_groups "
+        f"(hash_value, hash_type, file_count, total_size, created_date) "
+        f"SELECT {ref}.{t}_hash, '{t}', 1, COALESCE({ref}.file_size, 0), {ref}.download_date "
+        f"WHERE {ref}.{t}_hash IS NOT NULL "
+        f"ON CONFLICT(hash_value, hash_type) DO UPDATE SET "
+        f"file_count = file_count + 1, total_size = total_size + excluded.total_size, "
+        f"created_date = excluded.created_date; "
+        for t in HASH_TYPES
+    )
+
+
+def _leave_groups(ref: str) -> str:
+    """Trigger body taking file row ref out of its hash values and groups"""
+    return f"DELETE FROM file_hash_values WHERE file_id = {ref}.file_id; " + "".join(
+        f"UPDATE duplicate_groups SET file_count = file_count - 1, "
+        f"total_size = total_size - COALESCE({ref}.file_size, 0) "
+        f"WHERE hash_type = '{t}' AND hash_value = {ref}.{t}_hash; "
+        f"DELETE FROM duplicate_groups "
+        f"WHERE hash_type = '{t}' AND hash_value = {ref}.{t}_hash AND file_count <= 0; "
+        for t in HASH_TYPES
+    )
+
+
+# Keep file_hash_values and duplicate_groups in step with file_hashes
+_GROUP_TRIGGERS = (
+    f"CREATE TRIGGER IF NOT EXISTS trg_fh_ai AFTER INSERT ON file_hashes "
+    f"BEGIN {_join_groups('NEW')}END",
+    f"CREATE TRIGGER IF NOT EXISTS trg_fh_ad AFTER DELETE ON file_hashes "
+    f"BEGIN {_leave_groups('OLD')}END",
+    f"CREATE TRIGGER IF NOT EXISTS trg_fh_au AFTER UPDATE ON file_hashes "
+    f"WHEN OLD.file_id IS NOT NEW.file_id OR OLD.file_size IS NOT NEW.file_size "
+    + " ".join(f"OR OLD.{t}_hash IS NOT NEW.{t}_hash" for t in HASH_TYPES)
+    + f" BEGIN {_leave_groups('OLD')}{_join_groups('NEW')}END",
+)
+
+
+class _BloomFilter:
+    """Set membership with false positives but no false negatives"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.count = 0
+        self._size = ceil(-capacity * log(error_rate) / log(2) ** 2)
+        self._hashes = max(1, round(self._size / capacity * log(2)))
+        self._bits = bytearray((self._size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self._size for i in range(self._hashes))
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
 class HashDatabase:
+    # Hot statements are kept as constants so every call reuses the same
+    # string and hits the connection's prepared statement cache
+    # An upsert rather than INSERT OR REPLACE, so a re-added file fires the
+    # UPDATE trigger instead of a delete that triggers would not see
+    _SQL_INSERT = '''
+        INSERT INTO file_hashes
+        (file_id, file_name, file_size, md5_hash, sha1_hash,
+         drive_id, mime_type, download_date, file_path)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(file_id) DO UPDATE SET
+            file_name = excluded.file_name,
+            file_size = excluded.file_size,
+            md5_hash = excluded.md5_hash,
+            sha1_hash = excluded.sha1_hash,
+            drive_id = excluded.drive_id,
+            mime_type = excluded.mime_type,
+            download_date = excluded.download_date,
+            file_path = excluded.file_path
+    '''
+    _SQL_SELECT_BY_HASH = '''
+        SELECT f.file_id, f.file_name, f.file_size, f.drive_id, f.mime_type,
+               f.download_date, f.file_path
+        FROM file_hash_values v
+        JOIN file_hashes f ON f.file_id = v.file_id
+        WHERE v.hash_type = ? AND v.hash_value = ?
+        ORDER BY f.download_date DESC
+        LIMIT ?
+    '''
+    _SQL_SELECT_BY_FILE_ID = '''
+        SELECT file_id, file_name, file_size, md5_hash, sha1_hash,
+               drive_id, mime_type, download_date, file_path
+        FROM file_hashes
+        WHERE file_id = ?
+    '''
+    # short_hash is the display form, the first 16 and last 8 hex digits
+    _SQL_SELECT_GROUPS = '''
+        SELECT hash_value, hash_type, file_count, total_size, created_date,
+               CASE WHEN typeof(hash_value) = 'blob'
+                    THEN lower(hex(substr(hash_value, 1, 8))) || '...' ||
+                         lower(hex(substr(hash_value, -4)))
+                    ELSE substr(hash_value, 1, 16) || '...' || substr(hash_value, -8)
+               END AS short_hash
+        FROM duplicate_groups
+        WHERE hash_type = ? AND file_count >= ?
+        ORDER BY file_count DESC, total_size DESC
+    '''
+    # Wasted space counts every duplicate beyond the first, using the exact
+    # average size instead of integer division
+    _SQL_STATS = '''
+        WITH f AS (
+            SELECT COUNT(*) AS total_files, COALESCE(SUM(file_size), 0) AS total_size
+            FROM file_hashes
+        ), g AS (
+            SELECT COUNT(*) AS duplicate_groups,
+                   COALESCE(SUM(file_count), 0) AS duplicate_files,
+                   COALESCE(SUM(total_size - CAST(total_size AS REAL) / file_count), 0)
+                       AS wasted_space
+            FROM duplicate_groups WHERE file_count > 1
+        )
+        SELECT * FROM f, g
+    '''
+    _SQL_DELETE_BY_FILE_ID = 'DELETE FROM file_hashes WHERE file_id = ?'
+    _SQL_FILE_IDS_IN = 'SELECT file_id FROM file_hashes WHERE file_id IN ({})'
+    _SQL_HASHES_IN = '''
+        SELECT DISTINCT hash_value FROM file_hash_values
+        WHERE hash_type = ? AND hash_value IN ({})
+    '''
+
     def __init__(self, db_path: str = "file_hashes.db"):
         self.db_path = db_path
+        # Single long-lived writer, transactions are managed explicitly
+        self._conn = sqlite3.connect(
+            db_path, check_same_thread=False, isolation_level=None,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        self._write_lock = Lock()
+        self._apply_pragmas(self._conn, writer=True)
         self._init_database()
-    
+        with self._write_lock:
+            self._load_bloom(BLOOM_CAPACITY)
+        # Rows of queue_file_hash, written by a thread started on first use.
+        # None is a flush marker that ends the batch being collected
+        self._pending = Queue()
+        self._writer = None
+        self._readers = SimpleQueue()
+        if db_path != ":memory:":
+            for _ in range(READ_POOL_SIZE):
+                self._readers.put(self._open_reader())
+
+    def _open_reader(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        self._apply_pragmas(conn)
+        return conn
+
+    def _apply_pragmas(self, conn: sqlite3.Connection, writer: bool = False):
+        """Apply the connection tuning profile"""
+        conn.row_factory = sqlite3.Row
+        if writer:
+            journal_mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+            if journal_mode != "wal" and self.db_path != ":memory:":
+                LOGGER.warning(f"Hash database is not in WAL mode: {journal_mode}")
+            for pragma in _WRITER_PRAGMAS:
+                conn.execute(pragma)
+        for pragma in _CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+
+    @contextmanager
+    def _write(self):
+        """Run the block in one IMMEDIATE transaction on the writer connection"""
+        with self._write_lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @contextmanager
+    def _read(self):
+        """Borrow a read-only connection from the pool"""
+        if self.db_path == ":memory:":
+            # An in-memory database is only visible to the writer connection
+            with self._write_lock:
+                yield self._conn
+            return
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    def close(self):
+        """Close the writer and all pooled reader connections"""
+        self.flush()
+        while not self._readers.empty():
+            self._readers.get().close()
+        self._conn.close()
+
     def _init_database(self):
         """Initialize the hash database with required tables"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._write() as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS file_hashes (
@@ -23,356 +331,467 @@ class HashDatabase:
                         file_id TEXT UNIQUE,
                         file_name TEXT,
                         file_size INTEGER,
-                        md5_hash TEXT,
-                        sha1_hash TEXT,
+                        md5_hash BLOB,
+                        sha1_hash BLOB,
                         drive_id TEXT,
                         mime_type TEXT,
-                        download_date TIMESTAMP,
-                        file_path TEXT,
-                        INDEX(md5_hash),
-                        INDEX(sha1_hash),
-                        INDEX(file_id)
+                        download_date INTEGER,
+                        file_path TEXT
                     )
                 ''')
-                
+
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS duplicate_groups (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        hash_value TEXT,
+                        hash_value BLOB,
                         hash_type TEXT,
                         file_count INTEGER,
                         total_size INTEGER,
-                        created_date TIMESTAMP,
-                        INDEX(hash_value, hash_type)
+                        created_date INTEGER,
+                        UNIQUE(hash_value, hash_type)
                     )
                 ''')
-                
-                conn.commit()
-                LOGGER.info("Hash database initialized successfully")
+
+                # One row per (file, hash type) so every lookup shares one index
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS file_hash_values (
+                        file_id TEXT,
+                        hash_type TEXT,
+                        hash_value BLOB,
+                        PRIMARY KEY (hash_type, hash_value, file_id)
+                    ) WITHOUT ROWID
+                ''')
+
+                # file_id and (hash_value, hash_type) are covered by their UNIQUE constraints
+                cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_fh_md5 ON file_hashes(md5_hash) "
+                    "WHERE md5_hash IS NOT NULL"
+                )
+                cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_fh_sha1 ON file_hashes(sha1_hash) "
+                    "WHERE sha1_hash IS NOT NULL"
+                )
+                cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_dg_type_count "
+                    "ON duplicate_groups(hash_type, file_count DESC)"
+                )
+                cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_fhv_file_id "
+                    "ON file_hash_values(file_id)"
+                )
+
+                self._migrate_schema(conn)
+
+                # Created after the migration so its rewrites do not fire them
+                for trigger in _GROUP_TRIGGERS:
+                    cursor.execute(trigger)
+
+            LOGGER.info("Hash database initialized successfully")
         except Exception as e:
             LOGGER.error(f"Failed to initialize hash database: {e}")
             raise
-    
-    def add_file_hash(self, file_id: str, file_name: str, file_size: int, 
-                      md5_hash: str = None, sha1_hash: str = None, 
-                      drive_id: str = None, mime_type: str = None, 
+
+    @staticmethod
+    def _migrate_schema(conn: sqlite3.Connection):
+        """Bring databases created by older versions up to SCHEMA_VERSION"""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        if version < 1:
+            # Digests used to be stored as hex TEXT
+            conn.create_function("hash_to_blob", 1, _hash_to_blob, deterministic=True)
+            for table, column in (('file_hashes', 'md5_hash'),
+                                  ('file_hashes', 'sha1_hash'),
+                                  ('duplicate_groups', 'hash_value')):
+                conn.execute(f"UPDATE {table} SET {column} = hash_to_blob({column}) "
+                             f"WHERE typeof({column}) = 'text'")
+        if version < 2:
+            # Backfill file_hash_values from the denormalized columns
+            for hash_type in HASH_TYPES:
+                conn.execute(f"INSERT OR IGNORE INTO file_hash_values "
+                             f"SELECT file_id, '{hash_type}', {hash_type}_hash "
+                             f"FROM file_hashes WHERE {hash_type}_hash IS NOT NULL")
+        if version < 3:
+            # Dates used to be stored as local time ISO-8601 text
+            for table, column in (('file_hashes', 'download_date'),
+                                  ('duplicate_groups', 'created_date')):
+                conn.execute(f"UPDATE {table} "
+                             f"SET {column} = CAST(strftime('%s', {column}, 'utc') AS INTEGER) "
+                             f"WHERE typeof({column}) = 'text'")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _load_bloom(self, capacity: int):
+        """Build the file_id and digest filters used to skip lookups of
+        unknown files, the caller holds _write_lock so no row is committed
+        between the scan and the swap"""
+        conn = self._conn
+        count = conn.execute('SELECT COUNT(*) FROM file_hashes').fetchone()[0]
+        bloom = _BloomFilter(max(capacity, count * 2), BLOOM_ERROR_RATE)
+        for (file_id,) in conn.execute('SELECT file_id FROM file_hashes'):
+            bloom.add(file_id)
+        count = conn.execute('SELECT COUNT(*) FROM file_hash_values').fetchone()[0]
+        hash_bloom = _BloomFilter(max(capacity, count * 2), BLOOM_ERROR_RATE)
+        for hash_type, hash_value in conn.execute(
+            'SELECT hash_type, hash_value FROM file_hash_values'
+        ):
+            hash_bloom.add(_hash_key(hash_type, hash_value))
+        self._bloom = bloom
+        self._hash_bloom = hash_bloom
+
+    def probably_contains(self, hash_value: str, hash_type: str = 'md5') -> bool:
+        """False when no stored file has the digest, True may be a false positive"""
+        return _hash_key(hash_type, hash_value) in self._hash_bloom
+
+    def add_file_hash(self, file_id: str, file_name: str, file_size: int,
+                      md5_hash: str = None, sha1_hash: str = None,
+                      drive_id: str = None, mime_type: str = None,
                       file_path: str = None) -> bool:
         """Add or update file hash information"""
+        return self.add_file_hashes([(file_id, file_name, file_size, md5_hash,
+                                      sha1_hash, drive_id, mime_type, file_path)]) == 1
+
+    def add_file_hashes(self, rows: Iterable[Tuple]) -> int:
+        """Add or update many files in one transaction
+
+        Each row follows the add_file_hash argument order: (file_id, file_name,
+        file_size, md5_hash, sha1_hash, drive_id, mime_type, file_path)
+        """
+        now = int(_now())
+        # Later rows win for a repeated file_id
+        params = {
+            file_id: (file_id, file_name, file_size, _hash_to_blob(md5_hash),
+                      _hash_to_blob(sha1_hash), drive_id, mime_type, now, file_path)
+            for (file_id, file_name, file_size, md5_hash, sha1_hash,
+                 drive_id, mime_type, file_path) in rows
+        }
+        if not params:
+            return 0
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT OR REPLACE INTO file_hashes 
-                    (file_id, file_name, file_size, md5_hash, sha1_hash, 
-                     drive_id, mime_type, download_date, file_path)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (file_id, file_name, file_size, md5_hash, sha1_hash, 
-                      drive_id, mime_type, datetime.now(), file_path))
-                conn.commit()
-                
-                # Update duplicate groups
-                if md5_hash:
-                    self._update_duplicate_group(md5_hash, 'md5', file_size)
-                if sha1_hash:
-                    self._update_duplicate_group(sha1_hash, 'sha1', file_size)
-                
-                return True
-        except Exception as e:
-            LOGGER.error(f"Failed to add file hash: {e}")
-            return False
-    
-    def _update_duplicate_group(self, hash_value: str, hash_type: str, file_size: int):
-        """Update duplicate group statistics"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Count files with this hash
-                if hash_type == 'md5':
-                    cursor.execute('SELECT COUNT(*) FROM file_hashes WHERE md5_hash = ?', (hash_value,))
-                else:
-                    cursor.execute('SELECT COUNT(*) FROM file_hashes WHERE sha1_hash = ?', (hash_value,))
-                
-                file_count = cursor.fetchone()[0]
-                
-                cursor.execute('''
-                    INSERT OR REPLACE INTO duplicate_groups 
-                    (hash_value, hash_type, file_count, total_size, created_date)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (hash_value, hash_type, file_count, file_count * file_size, datetime.now()))
-                
-                conn.commit()
+            with self._write() as conn:
+                # file_hash_values and duplicate_groups follow via triggers
+                conn.executemany(self._SQL_INSERT, params.values())
+                # Added before COMMIT so a concurrent lookup can never miss a
+                # committed row, a rollback only leaves a harmless false positive
+                for row in params.values():
+                    self._bloom.add(row[0])
+                    for hash_type, hash_value in zip(HASH_TYPES, row[3:5]):
+                        if hash_value is not None:
+                            self._hash_bloom.add(_hash_key(hash_type, hash_value))
+                # Rebuilt under the write lock, the scan sees this transaction's
+                # rows and no other writer can add to a filter being replaced
+                bloom, hash_bloom = self._bloom, self._hash_bloom
+                if bloom.count > bloom.capacity or hash_bloom.count > hash_bloom.capacity:
+                    self._load_bloom(max(bloom.capacity, hash_bloom.capacity) * 2)
+            return len(params)
         except Exception as e:
-            LOGGER.error(f"Failed to update duplicate group: {e}")
-    
-    def check_duplicate_by_hash(self, md5_hash: str = None, sha1_hash: str = None) -> List[Dict]:
+            LOGGER.error(f"Failed to add file hashes: {e}")
+            return 0
+
+    def queue_file_hash(self, file_id: str, file_name: str, file_size: int,
+                        md5_hash: str = None, sha1_hash: str = None,
+                        drive_id: str = None, mime_type: str = None,
+                        file_path: str = None):
+        """Like add_file_hash but returns at once, the row is written by a
+        background thread together with other queued rows"""
+        if self._writer is None:
+            with self._write_lock:
+                if self._writer is None:
+                    self._writer = Thread(
+                        target=self._write_pending, name="hash_db_queue", daemon=True
+                    )
+                    self._writer.start()
+        self._pending.put((file_id, file_name, file_size, md5_hash, sha1_hash,
+                           drive_id, mime_type, file_path))
+
+    def flush(self):
+        """Block until every row of queue_file_hash is written"""
+        if self._writer is None:
+            return
+        self._pending.put(None)
+        self._pending.join()
+
+    def _write_pending(self):
+        pending = self._pending
+        while True:
+            rows = []
+            item = pending.get()
+            deadline = monotonic() + WRITE_BATCH_DELAY
+            while item is not None:
+                rows.append(item)
+                timeout = deadline - monotonic()
+                if len(rows) >= WRITE_BATCH_SIZE or timeout <= 0:
+                    break
+                try:
+                    item = pending.get(timeout=timeout)
+                except Empty:
+                    break
+            else:
+                # Also acknowledge the flush marker that ended the batch
+                pending.task_done()
+            try:
+                self.add_file_hashes(rows)
+            finally:
+                for _ in rows:
+                    pending.task_done()
+
+    def check_duplicate_by_hash(self, md5_hash: str = None, sha1_hash: str = None,
+                                limit: int = -1) -> List[Dict]:
         """Check if file with given hash already exists"""
+        if md5_hash:
+            return self._select_by_hash('md5', md5_hash, limit, "check duplicate by hash")
+        if sha1_hash:
+            return self._select_by_hash('sha1', sha1_hash, limit, "check duplicate by hash")
+        return []
+
+    def _select_by_hash(self, hash_type: str, hash_value: str, limit: int,
+                        action: str) -> List[Dict]:
+        """Get up to limit files (-1 for all) with the given digest, newest first"""
+        if not self.probably_contains(hash_value, hash_type):
+            return []
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                if md5_hash:
-                    cursor.execute('''
-                        SELECT file_id, file_name, file_size, drive_id, mime_type, 
-                               download_date, file_path 
-                        FROM file_hashes 
-                        WHERE md5_hash = ?
-                    ''', (md5_hash,))
-                elif sha1_hash:
-                    cursor.execute('''
-                        SELECT file_id, file_name, file_size, drive_id, mime_type, 
-                               download_date, file_path 
-                        FROM file_hashes 
-                        WHERE sha1_hash = ?
-                    ''', (sha1_hash,))
-                else:
-                    return []
-                
-                results = cursor.fetchall()
-                return [
-                    {
-                        'file_id': row[0],
-                        'file_name': row[1],
-                        'file_size': row[2],
-                        'drive_id': row[3],
-                        'mime_type': row[4],
-                        'download_date': row[5],
-                        'file_path': row[6]
-                    }
-                    for row in results
-                ]
+            return list(self.iter_files_by_hash(hash_value, hash_type, limit))
         except Exception as e:
-            LOGGER.error(f"Failed to check duplicate by hash: {e}")
+            LOGGER.error(f"Failed to {action}: {e}")
             return []
-    
+
+    def iter_files_by_hash(self, hash_value: str, hash_type: str = 'md5',
+                           limit: int = -1) -> Iterator[Dict]:
+        """Lazily yield files with specific hash, the reader is held until exhausted"""
+        with self._read() as conn:
+            for row in conn.execute(
+                self._SQL_SELECT_BY_HASH, (hash_type, _hash_to_blob(hash_value), limit)
+            ):
+                result = dict(row)
+                result['download_date'] = _from_epoch(row['download_date'])
+                yield result
+
     def check_duplicate_by_file_id(self, file_id: str) -> Optional[Dict]:
         """Check if file ID already exists in database"""
+        # Removed ids stay in the filter, so only a miss is conclusive
+        if file_id not in self._bloom:
+            return None
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT file_id, file_name, file_size, md5_hash, sha1_hash,
-                           drive_id, mime_type, download_date, file_path 
-                    FROM file_hashes 
-                    WHERE file_id = ?
-                ''', (file_id,))
-                
-                row = cursor.fetchone()
-                if row:
-                    return {
-                        'file_id': row[0],
-                        'file_name': row[1],
-                        'file_size': row[2],
-                        'md5_hash': row[3],
-                        'sha1_hash': row[4],
-                        'drive_id': row[5],
-                        'mime_type': row[6],
-                        'download_date': row[7],
-                        'file_path': row[8]
-                    }
-                return None
+            with self._read() as conn:
+                row = conn.execute(self._SQL_SELECT_BY_FILE_ID, (file_id,)).fetchone()
+            if row:
+                result = dict(row)
+                result['md5_hash'] = _hash_to_hex(row['md5_hash'])
+                result['sha1_hash'] = _hash_to_hex(row['sha1_hash'])
+                result['download_date'] = _from_epoch(row['download_date'])
+                return result
+            return None
         except Exception as e:
             LOGGER.error(f"Failed to check duplicate by file ID: {e}")
             return None
-    
+
+    def check_duplicates_bulk(self, file_ids: Iterable[str], md5s: Iterable[str] = (),
+                              sha1s: Iterable[str] = ()) -> set:
+        """Return the given file ids and digests that are already known
+
+        Every kind is resolved with chunked IN (...) queries, so checking a
+        whole folder costs a few statements instead of several per file.
+        """
+        found = set()
+        # Removed ids stay in the filter, so only a miss is conclusive
+        candidates = [file_id for file_id in set(file_ids)
+                      if file_id and file_id in self._bloom]
+        try:
+            with self._read() as conn:
+                for i in range(0, len(candidates), BULK_LOOKUP_CHUNK):
+                    chunk, size = _padded(candidates[i:i + BULK_LOOKUP_CHUNK])
+                    sql = _in_query(self._SQL_FILE_IDS_IN, size)
+                    found.update(row[0] for row in conn.execute(sql, chunk))
+                for hash_type, values in (('md5', md5s), ('sha1', sha1s)):
+                    # Matches are reported as the digests the caller passed in
+                    by_blob = {_hash_to_blob(value): value for value in values
+                               if value and self.probably_contains(value, hash_type)}
+                    blobs = list(by_blob)
+                    for i in range(0, len(blobs), BULK_LOOKUP_CHUNK):
+                        chunk, size = _padded(blobs[i:i + BULK_LOOKUP_CHUNK])
+                        sql = _in_query(self._SQL_HASHES_IN, size)
+                        found.update(by_blob[row[0]]
+                                     for row in conn.execute(sql, (hash_type, *chunk)))
+        except Exception as e:
+            LOGGER.error(f"Failed to check duplicates in bulk: {e}")
+        return found
+
     def get_duplicate_groups(self, hash_type: str = 'md5', min_files: int = 2) -> List[Dict]:
         """Get groups of duplicate files"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT hash_value, hash_type, file_count, total_size, created_date
-                    FROM duplicate_groups 
-                    WHERE hash_type = ? AND file_count >= ?
-                    ORDER BY file_count DESC, total_size DESC
-                ''', (hash_type, min_files))
-                
-                results = cursor.fetchall()
-                return [
-                    {
-                        'hash_value': row[0],
-                        'hash_type': row[1],
-                        'file_count': row[2],
-                        'total_size': row[3],
-                        'created_date': row[4]
-                    }
-                    for row in results
-                ]
+            return list(self.iter_duplicate_groups(hash_type, min_files))
         except Exception as e:
             LOGGER.error(f"Failed to get duplicate groups: {e}")
             return []
-    
-    def get_files_by_hash(self, hash_value: str, hash_type: str = 'md5') -> List[Dict]:
+
+    def iter_duplicate_groups(self, hash_type: str = 'md5', min_files: int = 2) -> Iterator[Dict]:
+        """Lazily yield groups of duplicate files, largest first"""
+        with self._read() as conn:
+            for row in conn.execute(self._SQL_SELECT_GROUPS, (hash_type, min_files)):
+                group = dict(row)
+                group['hash_value'] = _hash_to_hex(row['hash_value'])
+                group['created_date'] = _from_epoch(row['created_date'])
+                yield group
+
+    def get_files_by_hash(self, hash_value: str, hash_type: str = 'md5',
+                          limit: int = -1) -> List[Dict]:
         """Get all files with specific hash"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                if hash_type == 'md5':
-                    cursor.execute('''
-                        SELECT file_id, file_name, file_size, drive_id, mime_type, 
-                               download_date, file_path 
-                        FROM file_hashes 
-                        WHERE md5_hash = ?
-                        ORDER BY download_date DESC
-                    ''', (hash_value,))
-                else:
-                    cursor.execute('''
-                        SELECT file_id, file_name, file_size, drive_id, mime_type, 
-                               download_date, file_path 
-                        FROM file_hashes 
-                        WHERE sha1_hash = ?
-                        ORDER BY download_date DESC
-                    ''', (hash_value,))
-                
-                results = cursor.fetchall()
-                return [
-                    {
-                        'file_id': row[0],
-                        'file_name': row[1],
-                        'file_size': row[2],
-                        'drive_id': row[3],
-                        'mime_type': row[4],
-                        'download_date': row[5],
-                        'file_path': row[6]
-                    }
-                    for row in results
-                ]
-        except Exception as e:
-            LOGGER.error(f"Failed to get files by hash: {e}")
-            return []
-    
+        return self._select_by_hash(hash_type, hash_value, limit, "get files by hash")
+
     def remove_file_hash(self, file_id: str) -> bool:
         """Remove file hash from database"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Get hash values before deletion for group update
-                cursor.execute('SELECT md5_hash, sha1_hash FROM file_hashes WHERE file_id = ?', (file_id,))
-                row = cursor.fetchone()
-                
-                if row:
-                    md5_hash, sha1_hash = row
-                    
-                    # Delete the file record
-                    cursor.execute('DELETE FROM file_hashes WHERE file_id = ?', (file_id,))
-                    
-                    # Update duplicate groups
-                    if md5_hash:
-                        cursor.execute('SELECT COUNT(*) FROM file_hashes WHERE md5_hash = ?', (md5_hash,))
-                        count = cursor.fetchone()[0]
-                        if count == 0:
-                            cursor.execute('DELETE FROM duplicate_groups WHERE hash_value = ? AND hash_type = ?', 
-                                         (md5_hash, 'md5'))
-                        else:
-                            cursor.execute('''
-                                UPDATE duplicate_groups 
-                                SET file_count = ?, created_date = ?
-                                WHERE hash_value = ? AND hash_type = ?
-                            ''', (count, datetime.now(), md5_hash, 'md5'))
-                    
-                    if sha1_hash:
-                        cursor.execute('SELECT COUNT(*) FROM file_hashes WHERE sha1_hash = ?', (sha1_hash,))
-                        count = cursor.fetchone()[0]
-                        if count == 0:
-                            cursor.execute('DELETE FROM duplicate_groups WHERE hash_value = ? AND hash_type = ?', 
-                                         (sha1_hash, 'sha1'))
-                        else:
-                            cursor.execute('''
-                                UPDATE duplicate_groups 
-                                SET file_count = ?, created_date = ?
-                                WHERE hash_value = ? AND hash_type = ?
-                            ''', (count, datetime.now(), sha1_hash, 'sha1'))
-                    
-                    conn.commit()
-                    return True
-                
-                return False
+            with self._write() as conn:
+                # Group and hash value bookkeeping is done by the delete trigger
+                if not conn.execute(self._SQL_DELETE_BY_FILE_ID, (file_id,)).rowcount:
+                    return False
+
+            return True
         except Exception as e:
             LOGGER.error(f"Failed to remove file hash: {e}")
             return False
-    
+
     def get_database_stats(self) -> Dict:
         """Get database statistics"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Total files
-                cursor.execute('SELECT COUNT(*) FROM file_hashes')
-                total_files = cursor.fetchone()[0]
-                
-                # Total size
-                cursor.execute('SELECT SUM(file_size) FROM file_hashes')
-                total_size = cursor.fetchone()[0] or 0
-                
-                # Duplicate groups
-                cursor.execute('SELECT COUNT(*) FROM duplicate_groups WHERE file_count > 1')
-                duplicate_groups = cursor.fetchone()[0]
-                
-                # Files in duplicate groups
-                cursor.execute('''
-                    SELECT SUM(file_count) FROM duplicate_groups WHERE file_count > 1
-                ''')
-                duplicate_files = cursor.fetchone()[0] or 0
-                
-                # Wasted space (duplicate files beyond the first)
-                cursor.execute('''
-                    SELECT SUM((file_count - 1) * (total_size / file_count))
-                    FROM duplicate_groups WHERE file_count > 1
-                ''')
-                wasted_space = cursor.fetchone()[0] or 0
-                
-                return {
-                    'total_files': total_files,
-                    'total_size': total_size,
-                    'duplicate_groups': duplicate_groups,
-                    'duplicate_files': duplicate_files,
-                    'wasted_space': int(wasted_space),
-                    'efficiency': (1 - (wasted_space / total_size)) * 100 if total_size > 0 else 100
-                }
+            with self._read() as conn:
+                row = conn.execute(self._SQL_STATS).fetchone()
+            total_size = row['total_size']
+            wasted_space = row['wasted_space']
+            return {
+                'total_files': row['total_files'],
+                'total_size': total_size,
+                'duplicate_groups': row['duplicate_groups'],
+                'duplicate_files': row['duplicate_files'],
+                'wasted_space': int(wasted_space),
+                'efficiency': (1 - (wasted_space / total_size)) * 100 if total_size > 0 else 100
+            }
         except Exception as e:
             LOGGER.error(f"Failed to get database stats: {e}")
             return {}
-    
+
     def cleanup_orphaned_records(self) -> int:
         """Clean up orphaned records and rebuild duplicate groups"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
+            with self._write() as conn:
+                conn.execute(
+                    'DELETE FROM file_hash_values '
+                    'WHERE file_id NOT IN (SELECT file_id FROM file_hashes)'
+                )
+
                 # Clear duplicate groups table
-                cursor.execute('DELETE FROM duplicate_groups')
-                
-                # Rebuild duplicate groups from file_hashes
-                cursor.execute('''
-                    INSERT INTO duplicate_groups (hash_value, hash_type, file_count, total_size, created_date)
-                    SELECT md5_hash, 'md5', COUNT(*), SUM(file_size), MAX(download_date)
-                    FROM file_hashes 
-                    WHERE md5_hash IS NOT NULL 
-                    GROUP BY md5_hash
-                    HAVING COUNT(*) > 1
-                ''')
-                
-                cursor.execute('''
-                    INSERT INTO duplicate_groups (hash_value, hash_type, file_count, total_size, created_date)
-                    SELECT sha1_hash, 'sha1', COUNT(*), SUM(file_size), MAX(download_date)
-                    FROM file_hashes 
-                    WHERE sha1_hash IS NOT NULL 
-                    GROUP BY sha1_hash
-                    HAVING COUNT(*) > 1
-                ''')
-                
-                cleaned = cursor.rowcount
-                conn.commit()
-                
-                LOGGER.info(f"Cleaned up database, rebuilt {cleaned} duplicate groups")
-                return cleaned
-                
+                conn.execute('DELETE FROM duplicate_groups')
+
+                # Rebuild duplicate groups from file_hashes, single-file groups are
+                # kept so add_file_hashes can keep counting from them. The
+                # partial hash indexes let each GROUP BY stream in index order
+                cleaned = 0
+                for hash_type in HASH_TYPES:
+                    conn.execute(f'''
+                        INSERT INTO duplicate_groups (hash_value, hash_type, file_count, total_size, created_date)
+                        SELECT {hash_type}_hash, '{hash_type}', COUNT(*), SUM(file_size), MAX(download_date)
+                        FROM file_hashes
+                        WHERE {hash_type}_hash IS NOT NULL
+                        GROUP BY {hash_type}_hash
+                    ''')
+                    cleaned += conn.execute('SELECT changes()').fetchone()[0]
+
+                conn.execute('ANALYZE duplicate_groups')
+                conn.execute('ANALYZE file_hashes')
+                conn.execute('ANALYZE file_hash_values')
+
+            # A checkpoint cannot run inside the transaction above
+            with self._write_lock:
+                self._conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+            LOGGER.info(f"Cleaned up database, rebuilt {cleaned} duplicate groups")
+            return cleaned
+
         except Exception as e:
             LOGGER.error(f"Failed to cleanup database: {e}")
             return 0
 
-# Global hash database instance
-hash_db = HashDatabase()
\ No newline at end of file
+
+class AsyncHashDatabase:
+    """Awaitable front for HashDatabase that keeps SQLite off the event loop
+
+    Writes go through a single thread to match SQLite's single writer, reads
+    share one thread per pooled reader connection.
+    """
+
+    def __init__(self, sync_db: HashDatabase):
+        self._sync = sync_db
+        self._write_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="hash_db_write"
+        )
+        self._read_executor = ThreadPoolExecutor(
+            max_workers=READ_POOL_SIZE, thread_name_prefix="hash_db_read"
+        )
+
+    async def _write(self, func, *args, **kwargs):
+        return await get_running_loop().run_in_executor(
+            self._write_executor, partial(func, *args, **kwargs)
+        )
+
+    async def _read(self, func, *args, **kwargs):
+        return await get_running_loop().run_in_executor(
+            self._read_executor, partial(func, *args, **kwargs)
+        )
+
+    async def add_file_hash(self, *args, **kwargs) -> bool:
+        return await self._write(self._sync.add_file_hash, *args, **kwargs)
+
+    async def add_file_hashes(self, rows: Iterable[Tuple]) -> int:
+        return await self._write(self._sync.add_file_hashes, rows)
+
+    async def remove_file_hash(self, file_id: str) -> bool:
+        return await self._write(self._sync.remove_file_hash, file_id)
+
+    async def cleanup_orphaned_records(self) -> int:
+        return await self._write(self._sync.cleanup_orphaned_records)
+
+    async def check_duplicate_by_hash(self, md5_hash: str = None, sha1_hash: str = None,
+                                      limit: int = -1) -> List[Dict]:
+        return await self._read(self._sync.check_duplicate_by_hash, md5_hash, sha1_hash, limit)
+
+    async def check_duplicate_by_file_id(self, file_id: str) -> Optional[Dict]:
+        return await self._read(self._sync.check_duplicate_by_file_id, file_id)
+
+    async def check_duplicates_bulk(self, file_ids: Iterable[str], md5s: Iterable[str] = (),
+                                    sha1s: Iterable[str] = ()) -> set:
+        return await self._read(self._sync.check_duplicates_bulk, file_ids, md5s, sha1s)
+
+    async def get_duplicate_groups(self, hash_type: str = 'md5',
+                                   min_files: int = 2) -> List[Dict]:
+        return await self._read(self._sync.get_duplicate_groups, hash_type, min_files)
+
+    async def get_files_by_hash(self, hash_value: str, hash_type: str = 'md5',
+                                limit: int = -1) -> List[Dict]:
+        return await self._read(self._sync.get_files_by_hash, hash_value, hash_type, limit)
+
+    async def get_database_stats(self) -> Dict:
+        return await self._read(self._sync.get_database_stats)
+
+
+_open_lock = Lock()
+
+
+@cache
+def _open_hash_db(db_path: str) -> HashDatabase:
+    return HashDatabase(db_path)
+
+
+@cache
+def _open_async_hash_db(db_path: str) -> AsyncHashDatabase:
+    return AsyncHashDatabase(_open_hash_db(db_path))
+
+
+def get_hash_db(db_path: str = "file_hashes.db") -> HashDatabase:
+    """Shared hash database, opened on first use instead of at import"""
+    with _open_lock:
+        return _open_hash_db(db_path)
+
+
+def get_async_hash_db(db_path: str = "file_hashes.db") -> AsyncHashDatabase:
+    """Shared async facade over get_hash_db"""
+    with _open_lock:
+        return _open_async_hash_db(db_path)
@@ -1,44 +1,225 @@
 import sqlite3
 import json
 import os
-from aiofiles import open as aiopen
-from aiofiles.os import path as aiopath
+from aiofiles.os import makedirs
+from asyncio import CancelledError, create_task, sleep, to_thread
+from contextlib import contextmanager
+from functools import cache
+from threading import Lock
 from typing import Dict, Any, Optional, List
 from logging import getLogger
 from datetime import datetime
 
+from ...core.config_manager import Config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 LOGGER = getLogger(__name__)
 
+if orjson is not None:
+    def _dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    _loads = orjson.loads
+else:
+    _dumps = json.dumps
+    _loads = json.loads
+
+# JSON columns are stored as pre-parsed jsonb when SQLite supports it (3.45+),
+# older libraries keep plain JSON text. Both forms are accepted by json_* and
+# jsonb_* functions, so existing rows need no migration
+_JSONB = sqlite3.sqlite_version_info >= (3, 45, 0)
+_JSON_FN = "jsonb" if _JSONB else "json"
+_JSON_VALUE = "jsonb(?)" if _JSONB else "?"
+
+# Fixed statements per binary user document, the column is never taken from
+# input. The set statement reserves a zeroblob that the file is streamed into
+_USER_DOC_SQL = {
+    key: (
+        key.lower(),
+        f"UPDATE users SET {key.lower()} = zeroblob(?2) WHERE user_id = ?1 RETURNING rowid",
+        f"UPDATE users SET {key.lower()} = NULL WHERE user_id = ?",
+    )
+    for key in ("THUMBNAIL", "RCLONE_CONFIG", "TOKEN_PICKLE")
+}
+
+# Chunk size used when copying files into BLOB columns
+BLOB_CHUNK_SIZE = 1 << 20
+
+# Applied to every connection, journal_mode=WAL is persistent and only set once
+_CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -64000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA wal_autocheckpoint = 1000",
+)
+
+# Seconds between WAL truncations, bounds the -wal file after write bursts
+WAL_CHECKPOINT_INTERVAL = 300
+
 class LocalDbManager:
     """Local SQLite database manager that mirrors MongoDB functionality"""
     
+    _SQL_MERGE_JSON = (
+        "INSERT INTO {table} (bot_id, config_data) VALUES (?, " + _JSON_VALUE + ") "
+        "ON CONFLICT(bot_id) DO UPDATE SET config_data = "
+        + _JSON_FN + "_set(config_data{set_args})"
+    )
+    _SQL_REPLACE_DEPLOY_CONFIG = (
+        f"INSERT OR REPLACE INTO deploy_config (bot_id, config_data) VALUES (?, {_JSON_VALUE})"
+    )
+    _SQL_REPLACE_QBITTORRENT = (
+        f"INSERT OR REPLACE INTO qbittorrent (bot_id, config_data) VALUES (?, {_JSON_VALUE})"
+    )
+    _SQL_STREAM_PRIVATE_FILE = (
+        "INSERT OR REPLACE INTO files (bot_id, file_path, file_data) "
+        "VALUES (?, ?, zeroblob(?)) RETURNING rowid"
+    )
+    _SQL_DELETE_PRIVATE_FILE = "DELETE FROM files WHERE bot_id = ? AND file_path = ?"
+    _SQL_STREAM_NZB = (
+        "INSERT OR REPLACE INTO nzb (bot_id, config_data) "
+        "VALUES (?, zeroblob(?)) RETURNING rowid"
+    )
+    _SQL_UPSERT_USER = (
+        f"INSERT INTO users (user_id, user_data) VALUES (?, {_JSON_VALUE}) "
+        "ON CONFLICT(user_id) DO UPDATE SET user_data = excluded.user_data"
+    )
+    _SQL_REPLACE_RSS = (
+        f"INSERT OR REPLACE INTO rss (bot_id, user_id, rss_data) VALUES (?, ?, {_JSON_VALUE})"
+    )
+    _SQL_DELETE_RSS = "DELETE FROM rss WHERE bot_id = ? AND user_id = ?"
+    _SQL_REPLACE_TASK = "INSERT OR REPLACE INTO tasks (bot_id, link, cid, tag) VALUES (?, ?, ?, ?)"
+    _SQL_REPLACE_TASKS_JSON = (
+        "INSERT OR REPLACE INTO tasks (bot_id, link, cid, tag) "
+        "SELECT ?, value->>1, value->>0, value->>2 FROM json_each(?)"
+    )
+    _SQL_DELETE_TASK = "DELETE FROM tasks WHERE bot_id = ? AND link = ?"
+    _SQL_GROUP_TASKS = (
+        "SELECT cid, tag, json_group_array(link) FROM tasks "
+        "WHERE bot_id = ? GROUP BY cid, tag"
+    )
+    _SQL_DELETE_TASKS = "DELETE FROM tasks WHERE bot_id = ?"
+    _SQL_TRUNCATE = {
+        table: f"DELETE FROM {table} WHERE bot_id = ?"
+        for table in (
+            "deploy_config", "config", "aria2c", "qbittorrent", "files", "nzb", "rss", "tasks"
+        )
+    }
+    _SQL_TRUNCATE_USERS = "DELETE FROM users"
+    
     def __init__(self, db_path: str = "local_mltb.db"):
         self.db_path = db_path
         self._return = True
         self.db = None
+        self._bot_id = None
+        self._lock = Lock()
+        self._checkpoint_task = None
         
     async def connect(self):
         """Initialize local SQLite database"""
         try:
             # Create database directory if it doesn't exist
             db_dir = os.path.dirname(self.db_path)
-            if db_dir and not os.path.exists(db_dir):
-                os.makedirs(db_dir)
+            if db_dir:
+                await makedirs(db_dir, exist_ok=True)
                 
-            # Initialize database tables
-            self._init_tables()
-            self.db = self.db_path  # Set db to indicate successful connection
+            # Same id the Mongo backend keys on, TgClient.ID is not set yet here
+            self._bot_id = Config.BOT_TOKEN.split(":", 1)[0]
+            
+            # One connection is kept open for the lifetime of the manager
+            self.db = await to_thread(self._open)
+            await to_thread(self._init_tables)
+            self._checkpoint_task = create_task(self._checkpoint_loop())
             self._return = False
             LOGGER.info(f"Connected to local SQLite database: {self.db_path}")
         except Exception as e:
             LOGGER.error(f"Error connecting to local database: {e}")
+            if self.db is not None:
+                self.db.close()
             self.db = None
             self._return = True
             
+    def _open(self):
+        """Open a connection with the performance PRAGMAs applied"""
+        conn = sqlite3.connect(
+            self.db_path, check_same_thread=False, isolation_level=None
+        )
+        for pragma in _CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """Run the enclosed statements in one transaction on the shared connection"""
+        with self._lock:
+            cursor = self.db.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+
+    def _run_sync(self, func, *args):
+        with self._transaction() as cursor:
+            return func(cursor, *args)
+
+    async def _run(self, func, *args):
+        """Run func(cursor, *args) in one transaction on a worker thread"""
+        return await to_thread(self._run_sync, func, *args)
+
+    def _execute_sync(self, sql, params=(), many=False, fetch=None):
+        with self._transaction() as cursor:
+            if many:
+                cursor.executemany(sql, params)
+            else:
+                cursor.execute(sql, params)
+            if fetch == "one":
+                return cursor.fetchone()
+            if fetch == "all":
+                return cursor.fetchall()
+            return cursor.rowcount
+
+    async def _execute(self, sql, params=(), many=False, fetch=None):
+        """Run a single statement on a worker thread so the event loop never blocks on SQLite"""
+        return await to_thread(self._execute_sync, sql, params, many, fetch)
+
+    def _stream_file(self, cursor, sql, params, table, column, path):
+        """Reserve a zeroblob sized to the file and copy the file into it in chunks,
+        sql gets the size as its last parameter and must return the rowid"""
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            row = cursor.execute(sql, (*params, size)).fetchone()
+            if row is None:
+                return
+            view = memoryview(bytearray(min(size, BLOB_CHUNK_SIZE)))
+            with cursor.connection.blobopen(table, column, row[0]) as blob:
+                while size and (n := f.readinto(view[:size])):
+                    blob.write(view[:n])
+                    size -= n
+
+    def _init_storage(self, conn):
+        """One-time file layout setup, page_size/auto_vacuum need a VACUUM once data exists"""
+        if conn.execute("PRAGMA user_version").fetchone()[0]:
+            return
+        has_data = conn.execute("PRAGMA page_count").fetchone()[0] > 0
+        conn.execute("PRAGMA page_size = 32768")
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        if has_data:
+            conn.execute("VACUUM")
+        conn.execute("PRAGMA user_version = 1")
+
     def _init_tables(self):
         """Initialize all required tables"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
+        self._init_storage(self.db)
+        self.db.execute("PRAGMA journal_mode = WAL")
+        with self._transaction() as cursor:
             
             # Settings tables
             cursor.execute('''
@@ -117,13 +298,59 @@ class LocalDbManager:
                 )
             ''')
             
-            conn.commit()
+            # Covers get_incomplete_tasks, rows come out already grouped by (cid, tag)
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_tasks_bot_cover
+                ON tasks (bot_id, cid, tag, link)
+            ''')
             
+    def _checkpoint(self):
+        with self._lock:
+            self.db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    async def _checkpoint_loop(self):
+        """Periodically fold the WAL back into the database and truncate it"""
+        while True:
+            await sleep(WAL_CHECKPOINT_INTERVAL)
+            try:
+                await to_thread(self._checkpoint)
+            except CancelledError:
+                raise
+            except Exception as e:
+                LOGGER.error(f"Error checkpointing local database: {e}")
+
+    def _close(self):
+        with self._lock:
+            self.db.execute("PRAGMA optimize")
+            self.db.close()
+
     async def disconnect(self):
         """Disconnect from local database"""
+        if self._checkpoint_task is not None:
+            self._checkpoint_task.cancel()
+            self._checkpoint_task = None
+        if self.db is not None:
+            try:
+                await to_thread(self._close)
+            except Exception as e:
+                LOGGER.error(f"Error closing local database: {e}")
         self._return = True
         self.db = None
         
+    @staticmethod
+    @cache
+    def _merge_json_sql(table, key_count):
+        return LocalDbManager._SQL_MERGE_JSON.format(
+            table=table, set_args=", ?, json(?)" * key_count
+        )
+        
+    async def _merge_json(self, table, bot_id, dict_):
+        """Upsert keys into a JSON settings row, each key is set like Mongo's $set would"""
+        params = [bot_id, _dumps(dict_)]
+        for key, value in dict_.items():
+            params += (f'$."{key}"', _dumps(value))
+        await self._execute(self._merge_json_sql(table, len(dict_)), params)
+        
     async def update_deploy_config(self):
         """Update deployment configuration"""
         if self._return:
@@ -131,8 +358,6 @@ class LocalDbManager:
             
         try:
             from importlib import import_module
-            from ...core.mltb_client import TgClient
-            
             settings = import_module("config")
             config_file = {
                 key: value.strip() if isinstance(value, str) else value
@@ -140,13 +365,10 @@ class LocalDbManager:
                 if not key.startswith("__")
             }
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "INSERT OR REPLACE INTO deploy_config (bot_id, config_data) VALUES (?, ?)",
-                    (str(TgClient.ID), json.dumps(config_file))
-                )
-                conn.commit()
+            await self._execute(
+                self._SQL_REPLACE_DEPLOY_CONFIG,
+                (self._bot_id, _dumps(config_file))
+            )
         except Exception as e:
             LOGGER.error(f"Error updating deploy config: {e}")
             
@@ -156,25 +378,7 @@ class LocalDbManager:
             return
             
         try:
-            from ...core.mltb_client import TgClient
-            
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                # Get existing config
-                cursor.execute("SELECT config_data FROM config WHERE bot_id = ?", (str(TgClient.ID),))
-                result = cursor.fetchone()
-                
-                if result:
-                    existing_config = json.loads(result[0])
-                    existing_config.update(dict_)
-                else:
-                    existing_config = dict_
-                    
-                cursor.execute(
-                    "INSERT OR REPLACE INTO config (bot_id, config_data) VALUES (?, ?)",
-                    (str(TgClient.ID), json.dumps(existing_config))
-                )
-                conn.commit()
+            await self._merge_json("config", self._bot_id, dict_)
         except Exception as e:
             LOGGER.error(f"Error updating config: {e}")
             
@@ -184,25 +388,7 @@ class LocalDbManager:
             return
             
         try:
-            from ...core.mltb_client import TgClient
-            
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT config_data FROM aria2c WHERE bot_id = ?", (str(TgClient.ID),))
-                result = cursor.fetchone()
-                
-                if result:
-                    config = json.loads(result[0])
-                else:
-                    config = {}
-                    
-                config[key] = value
-                
-                cursor.execute(
-                    "INSERT OR REPLACE INTO aria2c (bot_id, config_data) VALUES (?, ?)",
-                    (str(TgClient.ID), json.dumps(config))
-                )
-                conn.commit()
+            await self._merge_json("aria2c", self._bot_id, {key: value})
         except Exception as e:
             LOGGER.error(f"Error updating aria2 config: {e}")
             
@@ -212,25 +398,7 @@ class LocalDbManager:
             return
             
         try:
-            from ...core.mltb_client import TgClient
-            
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT config_data FROM qbittorrent WHERE bot_id = ?", (str(TgClient.ID),))
-                result = cursor.fetchone()
-                
-                if result:
-                    config = json.loads(result[0])
-                else:
-                    config = {}
-                    
-                config[key] = value
-                
-                cursor.execute(
-                    "INSERT OR REPLACE INTO qbittorrent (bot_id, config_data) VALUES (?, ?)",
-                    (str(TgClient.ID), json.dumps(config))
-                )
-                conn.commit()
+            await self._merge_json("qbittorrent", self._bot_id, {key: value})
         except Exception as e:
             LOGGER.error(f"Error updating qbittorrent config: {e}")
             
@@ -240,16 +408,12 @@ class LocalDbManager:
             return
             
         try:
-            from ...core.mltb_client import TgClient
             from ... import qbit_options
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "INSERT OR REPLACE INTO qbittorrent (bot_id, config_data) VALUES (?, ?)",
-                    (str(TgClient.ID), json.dumps(qbit_options))
-                )
-                conn.commit()
+            await self._execute(
+                self._SQL_REPLACE_QBITTORRENT,
+                (self._bot_id, _dumps(qbit_options))
+            )
         except Exception as e:
             LOGGER.error(f"Error saving qbit settings: {e}")
             
@@ -259,28 +423,26 @@ class LocalDbManager:
             return
             
         try:
-            from ...core.mltb_client import TgClient
-            
             db_path = path.replace(".", "__")
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                if await aiopath.exists(path):
-                    async with aiopen(path, "rb") as pf:
-                        pf_bin = await pf.read()
-                    cursor.execute(
-                        "INSERT OR REPLACE INTO files (bot_id, file_path, file_data) VALUES (?, ?, ?)",
-                        (str(TgClient.ID), db_path, pf_bin)
+            def _write(cursor):
+                try:
+                    self._stream_file(
+                        cursor,
+                        self._SQL_STREAM_PRIVATE_FILE,
+                        (self._bot_id, db_path),
+                        "files",
+                        "file_data",
+                        path
                     )
-                else:
+                except FileNotFoundError:
                     cursor.execute(
-                        "DELETE FROM files WHERE bot_id = ? AND file_path = ?",
-                        (str(TgClient.ID), db_path)
+                        self._SQL_DELETE_PRIVATE_FILE,
+                        (self._bot_id, db_path)
                     )
+            
+            await self._run(_write)
                     
-                conn.commit()
-                
             if path == "config.py":
                 await self.update_deploy_config()
         except Exception as e:
@@ -292,18 +454,14 @@ class LocalDbManager:
             return
             
         try:
-            from ...core.mltb_client import TgClient
-            
-            async with aiopen("sabnzbd/SABnzbd.ini", "rb") as pf:
-                nzb_conf = await pf.read()
-                
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "INSERT OR REPLACE INTO nzb (bot_id, config_data) VALUES (?, ?)",
-                    (str(TgClient.ID), nzb_conf)
-                )
-                conn.commit()
+            await self._run(
+                self._stream_file,
+                self._SQL_STREAM_NZB,
+                (self._bot_id,),
+                "nzb",
+                "config_data",
+                "sabnzbd/SABnzbd.ini"
+            )
         except Exception as e:
             LOGGER.error(f"Error updating NZB config: {e}")
             
@@ -315,21 +473,14 @@ class LocalDbManager:
         try:
             from ... import user_data
             
-            data = user_data.get(user_id, {})
-            data = data.copy()
-            
-            # Extract binary data
-            thumbnail = data.pop("THUMBNAIL", None)
-            rclone_config = data.pop("RCLONE_CONFIG", None)
-            token_pickle = data.pop("TOKEN_PICKLE", None)
+            # Binary documents are only written by update_user_doc
+            data = {
+                key: value
+                for key, value in user_data.get(user_id, {}).items()
+                if key not in _USER_DOC_SQL
+            }
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "INSERT OR REPLACE INTO users (user_id, user_data, thumbnail, rclone_config, token_pickle) VALUES (?, ?, ?, ?, ?)",
-                    (user_id, json.dumps(data), thumbnail, rclone_config, token_pickle)
-                )
-                conn.commit()
+            await self._execute(self._SQL_UPSERT_USER, (user_id, _dumps(data)))
         except Exception as e:
             LOGGER.error(f"Error updating user data: {e}")
             
@@ -338,24 +489,18 @@ class LocalDbManager:
         if self._return:
             return
             
+        if key not in _USER_DOC_SQL:
+            LOGGER.error(f"Error updating user document: unknown key {key}")
+            return
+        column, set_sql, clear_sql = _USER_DOC_SQL[key]
+            
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                if path:
-                    async with aiopen(path, "rb") as doc:
-                        doc_bin = await doc.read()
-                    cursor.execute(
-                        f"UPDATE users SET {key} = ? WHERE user_id = ?",
-                        (doc_bin, user_id)
-                    )
-                else:
-                    cursor.execute(
-                        f"UPDATE users SET {key} = NULL WHERE user_id = ?",
-                        (user_id,)
-                    )
-                    
-                conn.commit()
+            if path:
+                await self._run(
+                    self._stream_file, set_sql, (user_id,), "users", column, path
+                )
+            else:
+                await self._execute(clear_sql, (user_id,))
         except Exception as e:
             LOGGER.error(f"Error updating user document: {e}")
             
@@ -366,16 +511,16 @@ class LocalDbManager:
             
         try:
             from ... import rss_dict
-            from ...core.mltb_client import TgClient
-            
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                for user_id, rss_data in rss_dict.items():
-                    cursor.execute(
-                        "INSERT OR REPLACE INTO rss (bot_id, user_id, rss_data) VALUES (?, ?, ?)",
-                        (str(TgClient.ID), user_id, json.dumps(rss_data))
-                    )
-                conn.commit()
+            # Rows are serialized here so the worker never iterates the live dict
+            rows = [
+                (self._bot_id, user_id, _dumps(rss_data))
+                for user_id, rss_data in rss_dict.items()
+            ]
+            await self._execute(
+                self._SQL_REPLACE_RSS,
+                rows,
+                many=True
+            )
         except Exception as e:
             LOGGER.error(f"Error updating all RSS data: {e}")
             
@@ -386,15 +531,10 @@ class LocalDbManager:
             
         try:
             from ... import rss_dict
-            from ...core.mltb_client import TgClient
-            
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "INSERT OR REPLACE INTO rss (bot_id, user_id, rss_data) VALUES (?, ?, ?)",
-                    (str(TgClient.ID), user_id, json.dumps(rss_dict[user_id]))
-                )
-                conn.commit()
+            await self._execute(
+                self._SQL_REPLACE_RSS,
+                (self._bot_id, user_id, _dumps(rss_dict[user_id]))
+            )
         except Exception as e:
             LOGGER.error(f"Error updating RSS data: {e}")
             
@@ -404,15 +544,10 @@ class LocalDbManager:
             return
             
         try:
-            from ...core.mltb_client import TgClient
-            
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "DELETE FROM rss WHERE bot_id = ? AND user_id = ?",
-                    (str(TgClient.ID), user_id)
-                )
-                conn.commit()
+            await self._execute(
+                self._SQL_DELETE_RSS,
+                (self._bot_id, user_id)
+            )
         except Exception as e:
             LOGGER.error(f"Error deleting RSS data: {e}")
             
@@ -422,33 +557,36 @@ class LocalDbManager:
             return
             
         try:
-            from ...core.mltb_client import TgClient
-            
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "INSERT OR REPLACE INTO tasks (bot_id, link, cid, tag) VALUES (?, ?, ?, ?)",
-                    (str(TgClient.ID), link, cid, tag)
-                )
-                conn.commit()
+            await self._execute(
+                self._SQL_REPLACE_TASK,
+                (self._bot_id, link, cid, tag)
+            )
         except Exception as e:
             LOGGER.error(f"Error adding incomplete task: {e}")
             
+    async def add_incomplete_tasks_bulk(self, rows):
+        """Add many (cid, link, tag) tasks with one statement over a JSON array"""
+        if self._return:
+            return
+            
+        try:
+            await self._execute(
+                self._SQL_REPLACE_TASKS_JSON,
+                (self._bot_id, _dumps(list(rows)))
+            )
+        except Exception as e:
+            LOGGER.error(f"Error adding incomplete tasks: {e}")
+            
     async def rm_complete_task(self, link):
         """Remove completed task"""
         if self._return:
             return
             
         try:
-            from ...core.mltb_client import TgClient
-            
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "DELETE FROM tasks WHERE bot_id = ? AND link = ?",
-                    (str(TgClient.ID), link)
-                )
-                conn.commit()
+            await self._execute(
+                self._SQL_DELETE_TASK,
+                (self._bot_id, link)
+            )
         except Exception as e:
             LOGGER.error(f"Error removing completed task: {e}")
             
@@ -459,27 +597,17 @@ class LocalDbManager:
             return notifier_dict
             
         try:
-            from ...core.mltb_client import TgClient
-            
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT link, cid, tag FROM tasks WHERE bot_id = ?",
-                    (str(TgClient.ID),)
-                )
+            def _pop_tasks(cursor):
+                # SQLite groups the links per (cid, tag), Python only decodes each list
+                cursor.execute(self._SQL_GROUP_TASKS, (self._bot_id,))
                 
-                for link, cid, tag in cursor.fetchall():
-                    if cid in notifier_dict:
-                        if tag in notifier_dict[cid]:
-                            notifier_dict[cid][tag].append(link)
-                        else:
-                            notifier_dict[cid][tag] = [link]
-                    else:
-                        notifier_dict[cid] = {tag: [link]}
+                for cid, tag, links in cursor:
+                    notifier_dict.setdefault(cid, {})[tag] = _loads(links)
                         
                 # Clear tasks after retrieving
-                cursor.execute("DELETE FROM tasks WHERE bot_id = ?", (str(TgClient.ID),))
-                conn.commit()
+                cursor.execute(self._SQL_DELETE_TASKS, (self._bot_id,))
+            
+            await self._run(_pop_tasks)
                 
         except Exception as e:
             LOGGER.error(f"Error getting incomplete tasks: {e}")
@@ -492,8 +620,6 @@ class LocalDbManager:
             return
             
         try:
-            from ...core.mltb_client import TgClient
-            
             table_mapping = {
                 "settings": ["deploy_config", "config", "aria2c", "qbittorrent", "files", "nzb"],
                 "users": ["users"],
@@ -503,15 +629,13 @@ class LocalDbManager:
             
             tables_to_clear = table_mapping.get(name, [name])
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
+            def _truncate(cursor):
                 for table in tables_to_clear:
-                    if table in ["deploy_config", "config", "aria2c", "qbittorrent", "nzb", "rss", "tasks"]:
-                        cursor.execute(f"DELETE FROM {table} WHERE bot_id = ?", (str(TgClient.ID),))
-                    elif table == "files":
-                        cursor.execute(f"DELETE FROM {table} WHERE bot_id = ?", (str(TgClient.ID),))
-                    elif table == "users":
-                        cursor.execute(f"DELETE FROM {table}")
-                conn.commit()
+                    if table == "users":
+                        cursor.execute(self._SQL_TRUNCATE_USERS)
+                    elif sql := self._SQL_TRUNCATE.get(table):
+                        cursor.execute(sql, (self._bot_id,))
+            
+            await self._run(_truncate)
         except Exception as e:
             LOGGER.error(f"Error truncating table {name}: {e}")
\ No newline at end of file
@@ -3,9 +3,11 @@ Optimized file operations utility for better performance and memory efficiency.
 """
 
 import aiofiles
-from asyncio import gather, create_subprocess_exec, PIPE
+from asyncio import gather, to_thread
+from collections import OrderedDict
 from pathlib import Path
 from typing import AsyncGenerator, Optional, Union
+import errno
 import os
 
 # Optimized buffer sizes for different operations
@@ -13,6 +15,77 @@ BUFFER_SIZE_SMALL = 64 * 1024  # 64KB for small files
 BUFFER_SIZE_MEDIUM = 1024 * 1024  # 1MB for medium files  
 BUFFER_SIZE_LARGE = 8 * 1024 * 1024  # 8MB for large files
 
+# Errors meaning the kernel copy call is unusable for this pair of files
+_KERNEL_COPY_UNSUPPORTED = {
+    errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP
+}
+
+
+def _copy_range(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    return os.copy_file_range(src_fd, dst_fd, count, offset, offset)
+
+
+def _sendfile(src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+    return os.sendfile(dst_fd, src_fd, offset, count)
+
+
+_KERNEL_COPIERS = tuple(
+    copier
+    for copier, name in ((_copy_range, "copy_file_range"), (_sendfile, "sendfile"))
+    if hasattr(os, name)
+)
+
+
+def _drop_page_cache(*fds: int) -> None:
+    """Tell the kernel the copied pages will not be read again through us."""
+    if hasattr(os, 'posix_fadvise'):
+        for fd in fds:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+
+
+def _kernel_copy(src_path: Path, dst_path: Path, file_size: int) -> bool:
+    """Copy without passing data through Python, False if no kernel path works."""
+    with open(src_path, 'rb') as src_file, open(dst_path, 'wb') as dst_file:
+        src_fd, dst_fd = src_file.fileno(), dst_file.fileno()
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(src_fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        offset = 0
+        for copier in _KERNEL_COPIERS:
+            try:
+                while offset < file_size:
+                    copied = copier(src_fd, dst_fd, offset, file_size - offset)
+                    if not copied:
+                        break
+                    offset += copied
+                _drop_page_cache(src_fd, dst_fd)
+                return True
+            except OSError as e:
+                if e.errno not in _KERNEL_COPY_UNSUPPORTED:
+                    raise
+    return False
+
+
+def _remove_empty_dirs(root: str) -> None:
+    # Bottom-up walk, children are removed before their parent is tried
+    for dirpath, _, filenames in os.walk(root, topdown=False):
+        if filenames or dirpath == root:
+            continue
+        try:
+            os.rmdir(dirpath)
+        except OSError:
+            # Directory not empty or other error, skip
+            pass
+
+
+def _scan_file_sizes(dir_path: str) -> list:
+    with os.scandir(dir_path) as entries:
+        return [
+            (entry.path, entry.stat().st_size)
+            for entry in entries
+            if entry.is_file()
+        ]
+
+
 class OptimizedFileOps:
     """Optimized file operations with better buffering and async I/O."""
     
@@ -38,6 +111,9 @@ class OptimizedFileOps:
         if file_size is None:
             file_size = src_path.stat().st_size
             
+        if await to_thread(_kernel_copy, src_path, dst_path, file_size):
+            return
+            
         buffer_size = OptimizedFileOps.get_optimal_buffer_size(file_size)
         
         async with aiofiles.open(src_path, 'rb') as src_file:
@@ -47,6 +123,10 @@ class OptimizedFileOps:
                     if not chunk:
                         break
                     await dst_file.write(chunk)
+                await dst_file.flush()
+                await to_thread(
+                    _drop_page_cache, src_file.fileno(), dst_file.fileno()
+                )
     
     @staticmethod
     async def read_file_chunked(file_path: Union[str, Path], 
@@ -75,28 +155,12 @@ class OptimizedFileOps:
     @staticmethod
     async def create_directory_tree(path: Union[str, Path]) -> None:
         """Create directory tree if it doesn't exist."""
-        path = Path(path)
-        if not path.exists():
-            await aiofiles.os.makedirs(path, exist_ok=True)
+        await aiofiles.os.makedirs(path, exist_ok=True)
     
     @staticmethod
     async def cleanup_empty_dirs(root_path: Union[str, Path]) -> None:
         """Remove empty directories recursively."""
-        root = Path(root_path)
-        
-        # Get all subdirectories
-        subdirs = [p for p in root.rglob('*') if p.is_dir()]
-        
-        # Sort by depth (deepest first) to remove from bottom up
-        subdirs.sort(key=lambda p: len(p.parts), reverse=True)
-        
-        for subdir in subdirs:
-            try:
-                if not any(subdir.iterdir()):  # Directory is empty
-                    await aiofiles.os.rmdir(subdir)
-            except OSError:
-                # Directory not empty or other error, skip
-                pass
+        await to_thread(_remove_empty_dirs, os.fspath(root_path))
     
     @staticmethod
     async def move_file_optimized(src: Union[str, Path], dst: Union[str, Path]) -> None:
@@ -125,30 +189,54 @@ class OptimizedFileOps:
 
 
 class FileCache:
-    """Simple file metadata cache to avoid repeated stat calls."""
+    """LRU file size cache to avoid repeated stat calls."""
     
     def __init__(self, max_size: int = 1000):
-        self.cache = {}
+        self.cache = OrderedDict()
         self.max_size = max_size
+        # Single-slot fast path for repeated lookups of the same file
+        self._last_path = None
+        self._last_size = 0
     
     async def get_file_size(self, file_path: Union[str, Path]) -> int:
         """Get file size with caching."""
         path_str = str(file_path)
+        if path_str == self._last_path:
+            return self._last_size
         
-        if path_str not in self.cache:
-            if len(self.cache) >= self.max_size:
-                # Simple LRU: remove oldest entry
-                oldest_key = next(iter(self.cache))
-                del self.cache[oldest_key]
-            
+        size = self.cache.get(path_str)
+        if size is None:
             size = await OptimizedFileOps.get_file_size_async(file_path)
             self.cache[path_str] = size
+            if len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(path_str)
         
-        return self.cache[path_str]
+        self._last_path = path_str
+        self._last_size = size
+        return size
+    
+    async def warm_dir(self, dir_path: Union[str, Path]) -> None:
+        """Cache the size of every file in a directory with one scandir pass."""
+        for path_str, size in await to_thread(_scan_file_sizes, os.fspath(dir_path)):
+            self.cache[path_str] = size
+            self.cache.move_to_end(path_str)
+        while len(self.cache) > self.max_size:
+            self.cache.popitem(last=False)
+        self._last_path = None
+    
+    def invalidate(self, file_path: Union[str, Path]):
+        """Drop a path whose size changed, e.g. after it was rewritten."""
+        path_str = str(file_path)
+        self.cache.pop(path_str, None)
+        if path_str == self._last_path:
+            self._last_path = None
     
     def clear(self):
         """Clear the cache."""
         self.cache.clear()
+        self._last_path = None
 
 
 # Global file cache instance
@@ -4,93 +4,175 @@ Performance monitoring utility for tracking bot performance and identifying bott
 
 import asyncio
 import functools
+import heapq
+import os
 import psutil
+import sys
 import time
-from collections import defaultdict, deque
+from collections import Counter, defaultdict, deque
 from contextlib import asynccontextmanager
+from os import environ
 from typing import Dict, List, Optional, Any
 import logging
 
 logger = logging.getLogger(__name__)
 
+NS_PER_SECOND = 1_000_000_000
+
+# Function timing is opt-in, read once at import so changing MLTB_PERF_MON
+# requires a restart. Disabled decorators return the function unwrapped
+_ENABLED = environ.get('MLTB_PERF_MON', '0') == '1'
+
+# Number of latest system samples averaged by get_system_summary
+SUMMARY_WINDOW = 10
+
+# Disk usage changes slowly and statvfs can block on slow mounts, so it is
+# sampled at most once per this many seconds
+DISK_USAGE_TTL = 300
+
+# Distinct exception types counted separately, later new types go to '_other'
+MAX_ERROR_TYPES = 512
+
+
+def _stats_in_seconds(metrics: Dict) -> Dict:
+    """Convert the integer nanosecond counters to the seconds callers report,
+    the average is derived here rather than on every recorded call."""
+    call_count = metrics['call_count']
+    return {
+        'call_count': call_count,
+        'total_time': metrics['total_ns'] / NS_PER_SECOND,
+        'avg_time': metrics['total_ns'] / call_count / NS_PER_SECOND,
+        'min_time': metrics['min_ns'] / NS_PER_SECOND,
+        'max_time': metrics['max_ns'] / NS_PER_SECOND,
+        'recent_times': [t / NS_PER_SECOND for t in metrics['recent_ns']],
+    }
+
+
+# Sort keys of get_top_functions computed on the raw counters, so only the
+# selected entries are converted to seconds
+_SORT_KEYS = {
+    'call_count': lambda m: m['call_count'],
+    'total_time': lambda m: m['total_ns'],
+    'avg_time': lambda m: m['total_ns'] / m['call_count'],
+    'min_time': lambda m: m['min_ns'],
+    'max_time': lambda m: m['max_ns'],
+}
+
 
 class PerformanceMetrics:
     """Track performance metrics for the bot."""
     
     def __init__(self, max_history: int = 1000):
         self.max_history = max_history
+        # Durations are kept as integer nanoseconds from perf_counter_ns
         self.function_metrics = defaultdict(lambda: {
             'call_count': 0,
-            'total_time': 0.0,
-            'avg_time': 0.0,
-            'min_time': float('inf'),
-            'max_time': 0.0,
-            'recent_times': deque(maxlen=100)
+            'total_ns': 0,
+            'min_ns': 1 << 63,
+            'max_ns': 0,
+            'recent_ns': deque(maxlen=100)
         })
         self.system_metrics = deque(maxlen=max_history)
-        self.error_counts = defaultdict(int)
-        self.start_time = time.time()
+        # Running sums over the newest samples of system_metrics, updated as
+        # samples come in
+        self._window = min(SUMMARY_WINDOW, max_history)
+        self._cpu_sum = 0.0
+        self._mem_sum = 0.0
+        self.error_counts = Counter()
+        self.start_time = time.monotonic()
+        self._disk_cache = None
+        self._disk_next_ts = 0
+        # The first cpu_percent call only sets the baseline, prime it here so
+        # every sample reports the bot's own usage since the previous one
+        self._proc = psutil.Process()
+        self._proc.cpu_percent(None)
     
-    def record_function_call(self, func_name: str, execution_time: float):
+    def record_function_call(self, func_name: str, execution_ns: int):
         """Record metrics for a function call."""
         metrics = self.function_metrics[func_name]
         metrics['call_count'] += 1
-        metrics['total_time'] += execution_time
-        metrics['avg_time'] = metrics['total_time'] / metrics['call_count']
-        metrics['min_time'] = min(metrics['min_time'], execution_time)
-        metrics['max_time'] = max(metrics['max_time'], execution_time)
-        metrics['recent_times'].append(execution_time)
+        metrics['total_ns'] += execution_ns
+        if execution_ns < metrics['min_ns']:
+            metrics['min_ns'] = execution_ns
+        if execution_ns > metrics['max_ns']:
+            metrics['max_ns'] = execution_ns
+        metrics['recent_ns'].append(execution_ns)
     
     def record_system_metrics(self):
         """Record current system metrics."""
         try:
-            cpu_percent = psutil.cpu_percent()
+            cpu_percent = self._proc.cpu_percent(None)
+            load1, load5, load15 = os.getloadavg()
             memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('/')
+            now = time.monotonic()
+            if now >= self._disk_next_ts:
+                self._disk_cache = psutil.disk_usage('/')
+                self._disk_next_ts = now + DISK_USAGE_TTL
+            disk = self._disk_cache
             
-            self.system_metrics.append({
+            sample = {
                 'timestamp': time.time(),
                 'cpu_percent': cpu_percent,
+                'load_avg_1m': load1,
+                'load_avg_5m': load5,
+                'load_avg_15m': load15,
                 'memory_percent': memory.percent,
                 'memory_used_mb': memory.used / (1024 * 1024),
                 'disk_percent': disk.percent,
                 'disk_used_gb': disk.used / (1024 * 1024 * 1024)
-            })
+            }
+            # Indexing near the end of the deque only walks the last block
+            samples = self.system_metrics
+            if len(samples) >= self._window:
+                oldest = samples[-self._window]
+                self._cpu_sum -= oldest['cpu_percent']
+                self._mem_sum -= oldest['memory_percent']
+            self._cpu_sum += cpu_percent
+            self._mem_sum += memory.percent
+            samples.append(sample)
         except Exception as e:
             logger.error(f"Error recording system metrics: {e}")
     
     def get_function_stats(self, func_name: str) -> Dict:
         """Get statistics for a specific function."""
-        return dict(self.function_metrics.get(func_name, {}))
+        metrics = self.function_metrics.get(func_name)
+        return _stats_in_seconds(metrics) if metrics else {}
     
     def get_top_functions(self, limit: int = 10, sort_by: str = 'avg_time') -> List[Dict]:
         """Get top functions by specified metric."""
-        functions = []
-        for func_name, metrics in self.function_metrics.items():
-            functions.append({
-                'name': func_name,
-                **metrics
-            })
-        
-        return sorted(functions, key=lambda x: x.get(sort_by, 0), reverse=True)[:limit]
+        sort_key = _SORT_KEYS.get(sort_by)
+        key = (lambda item: sort_key(item[1])) if sort_key else (lambda item: 0)
+        items = self.function_metrics.items()
+        # A heap only pays off when selecting a few entries out of many
+        if limit >= len(items) // 2:
+            top = sorted(items, key=key, reverse=True)[:limit]
+        else:
+            top = heapq.nlargest(limit, items, key=key)
+        return [
+            {'name': func_name, **_stats_in_seconds(metrics)}
+            for func_name, metrics in top
+        ]
     
     def get_system_summary(self) -> Dict:
         """Get summary of system metrics."""
-        if not self.system_metrics:
+        samples = self.system_metrics
+        if not samples:
             return {}
         
-        recent_metrics = list(self.system_metrics)[-10:]  # Last 10 readings
-        
+        count = min(len(samples), self._window)
         return {
-            'current': recent_metrics[-1] if recent_metrics else {},
-            'avg_cpu': sum(m['cpu_percent'] for m in recent_metrics) / len(recent_metrics),
-            'avg_memory': sum(m['memory_percent'] for m in recent_metrics) / len(recent_metrics),
-            'uptime_seconds': time.time() - self.start_time
+            'current': samples[-1],
+            'avg_cpu': self._cpu_sum / count,
+            'avg_memory': self._mem_sum / count,
+            'uptime_seconds': time.monotonic() - self.start_time
         }
     
     def record_error(self, error_type: str):
         """Record an error occurrence."""
-        self.error_counts[error_type] += 1
+        error_counts = self.error_counts
+        if error_type not in error_counts and len(error_counts) >= MAX_ERROR_TYPES:
+            error_type = '_other'
+        error_counts[error_type] += 1
     
     def get_error_summary(self) -> Dict:
         """Get error summary."""
@@ -102,14 +184,18 @@ performance_metrics = PerformanceMetrics()
 
 
 def monitor_performance(func_name: Optional[str] = None):
-    """Decorator to monitor function performance."""
+    """Decorator to monitor function performance, a no-op unless enabled."""
+    if not _ENABLED:
+        return lambda func: func
+
     def decorator(func):
-        name = func_name or f"{func.__module__}.{func.__name__}"
+        # Interned so function_metrics lookups compare keys by identity
+        name = sys.intern(func_name or f"{func.__module__}.{func.__name__}")
         
         if asyncio.iscoroutinefunction(func):
             @functools.wraps(func)
             async def async_wrapper(*args, **kwargs):
-                start_time = time.time()
+                start_ns = time.perf_counter_ns()
                 try:
                     result = await func(*args, **kwargs)
                     return result
@@ -117,13 +203,14 @@ def monitor_performance(func_name: Optional[str] = None):
                     performance_metrics.record_error(type(e).__name__)
                     raise
                 finally:
-                    execution_time = time.time() - start_time
-                    performance_metrics.record_function_call(name, execution_time)
+                    performance_metrics.record_function_call(
+                        name, time.perf_counter_ns() - start_ns
+                    )
             return async_wrapper
         else:
             @functools.wraps(func)
             def sync_wrapper(*args, **kwargs):
-                start_time = time.time()
+                start_ns = time.perf_counter_ns()
                 try:
                     result = func(*args, **kwargs)
                     return result
@@ -131,8 +218,9 @@ def monitor_performance(func_name: Optional[str] = None):
                     performance_metrics.record_error(type(e).__name__)
                     raise
                 finally:
-                    execution_time = time.time() - start_time
-                    performance_metrics.record_function_call(name, execution_time)
+                    performance_metrics.record_function_call(
+                        name, time.perf_counter_ns() - start_ns
+                    )
             return sync_wrapper
     
     return decorator
@@ -141,15 +229,20 @@ def monitor_performance(func_name: Optional[str] = None):
 @asynccontextmanager
 async def performance_context(operation_name: str):
     """Context manager for monitoring performance of code blocks."""
-    start_time = time.time()
+    if not _ENABLED:
+        yield
+        return
+    operation_name = sys.intern(operation_name)
+    start_ns = time.perf_counter_ns()
     try:
         yield
     except Exception as e:
         performance_metrics.record_error(type(e).__name__)
         raise
     finally:
-        execution_time = time.time() - start_time
-        performance_metrics.record_function_call(operation_name, execution_time)
+        performance_metrics.record_function_call(
+            operation_name, time.perf_counter_ns() - start_ns
+        )
 
 
 class PerformanceReporter:
@@ -197,8 +290,9 @@ class PerformanceReporter:
 class SystemMonitor:
     """Monitor system resources periodically."""
     
-    def __init__(self, interval: int = 60):
+    def __init__(self, interval: int = 60, report_interval: int = 1800):
         self.interval = interval
+        self.report_interval = report_interval
         self.monitoring = False
         self.task = None
     
@@ -223,16 +317,25 @@ class SystemMonitor:
         logger.info("System monitoring stopped")
     
     async def _monitor_loop(self):
-        """Main monitoring loop."""
+        """Main monitoring loop, takes system samples and logs the periodic
+        performance summary from a single task."""
+        now = time.monotonic()
+        next_sample = now
+        next_report = now + self.report_interval
         while self.monitoring:
             try:
-                performance_metrics.record_system_metrics()
-                await asyncio.sleep(self.interval)
+                await asyncio.sleep(max(0, min(next_sample, next_report) - time.monotonic()))
+                now = time.monotonic()
+                if now >= next_sample:
+                    next_sample = now + self.interval
+                    performance_metrics.record_system_metrics()
+                if now >= next_report:
+                    next_report = now + self.report_interval
+                    PerformanceReporter.log_performance_summary()
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error(f"Error in monitoring loop: {e}")
-                await asyncio.sleep(self.interval)
 
 
 # Global system monitor instance
@@ -242,14 +345,6 @@ system_monitor = SystemMonitor()
 async def start_performance_monitoring():
     """Start all performance monitoring."""
     await system_monitor.start_monitoring()
-    
-    # Log performance summary every 30 minutes
-    async def periodic_report():
-        while True:
-            await asyncio.sleep(1800)  # 30 minutes
-            PerformanceReporter.log_performance_summary()
-    
-    asyncio.create_task(periodic_report())
     logger.info("Performance monitoring initialized")
 
 
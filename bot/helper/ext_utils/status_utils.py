@@ -8,6 +8,7 @@ from ...core.config_manager import Config
 from ..telegram_helper.button_build import ButtonMaker
 
 SIZE_UNITS = ["B", "KB", "MB", "GB", "TB", "PB"]
+_SIZE_SCALES = tuple((1 << (10 * i), unit) for i, unit in enumerate(SIZE_UNITS))
 
 
 class MirrorStatus:
@@ -94,12 +95,16 @@ def get_readable_file_size(size_in_bytes):
     if not size_in_bytes:
         return "0B"
 
-    index = 0
-    while size_in_bytes >= 1024 and index < len(SIZE_UNITS) - 1:
-        size_in_bytes /= 1024
-        index += 1
+    if size_in_bytes < 1024:
+        return f"{size_in_bytes:.2f}B"
 
-    return f"{size_in_bytes:.2f}{SIZE_UNITS[index]}"
+    # Every unit is 10 more bits, pick it from the bit length instead of
+    # dividing in a loop
+    index = (int(size_in_bytes).bit_length() - 1) // 10
+    if index >= len(_SIZE_SCALES):
+        index = len(_SIZE_SCALES) - 1
+    scale, unit = _SIZE_SCALES[index]
+    return f"{size_in_bytes / scale:.2f}{unit}"
 
 
 def get_readable_time(seconds: int):
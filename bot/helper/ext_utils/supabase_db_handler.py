@@ -1,21 +1,50 @@
-from aiofiles import open as aiopen
 from aiofiles.os import path as aiopath
 from supabase import create_client, Client
+import base64
 import json
 import asyncio
-from functools import wraps
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+from importlib import import_module
 
 from ... import LOGGER, user_data, rss_dict, qbit_options
 from ...core.mltb_client import TgClient
 from ...core.config_manager import Config
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    def _enc(obj):
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    _dec = orjson.loads
+else:
+    _enc = json.dumps
+    _dec = json.loads
+
+# Storage bucket holding private files, settings rows only keep the object path
+STORAGE_BUCKET = 'mltb-files'
+# Upper bound of concurrent per-user requests to Supabase
+MAX_CONCURRENT_UPSERTS = 16
+# Worker threads of the pool that runs the blocking Supabase client calls
+SUPABASE_WORKERS = 16
+# Binary user documents, stored through update_user_doc only
+_EXCLUDE = frozenset(("THUMBNAIL", "RCLONE_CONFIG", "TOKEN_PICKLE"))
+# Read size when base64 encoding files, a multiple of 3 so chunks need no padding
+B64_CHUNK_SIZE = 3 << 18
+
 
 def run_sync(func):
-    """Decorator to run sync functions in async context"""
+    """Decorator to run sync methods in the manager's own thread pool"""
     @wraps(func)
-    async def wrapper(*args, **kwargs):
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, func, *args, **kwargs)
+    async def wrapper(self, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, partial(func, self, *args, **kwargs)
+        )
     return wrapper
 
 
@@ -25,6 +54,10 @@ class SupabaseDbManager:
         self.client: Client = None
         self.db = self
         self.bot_id = None
+        # Settings rows that are read-modify-written, kept after the first read
+        self._settings_cache = {}
+        self._rss_sem = None
+        self._executor = None
 
     async def connect(self):
         """Initialize connection to Supabase"""
@@ -36,9 +69,14 @@ class SupabaseDbManager:
             # Create Supabase client
             self.client = create_client(Config.SUPABASE_URL, Config.SUPABASE_SERVICE_KEY)
             self.bot_id = str(TgClient.ID)
+            self._rss_sem = asyncio.Semaphore(MAX_CONCURRENT_UPSERTS)
+            # Supabase requests get their own pool so they never starve
+            # aiofiles and to_thread calls of the default executor
+            self._executor = ThreadPoolExecutor(
+                max_workers=SUPABASE_WORKERS, thread_name_prefix='supabase'
+            )
             
-            # Test connection by creating tables if they don't exist
-            await self._ensure_tables()
+            await self._check_connection()
             
             self._return = False
             LOGGER.info("Connected to Supabase database")
@@ -51,34 +89,16 @@ class SupabaseDbManager:
         """Close Supabase connection"""
         self._return = True
         self.client = None
+        self._settings_cache.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
 
     @run_sync
-    def _ensure_tables(self):
-        """Ensure all required tables exist"""
-        try:
-            # Create settings table for configuration
-            self.client.table('mltb_settings').select('*').limit(1).execute()
-        except:
-            # Table doesn't exist, it will be created by first insert
-            pass
-        
-        try:
-            # Create users table
-            self.client.table('mltb_users').select('*').limit(1).execute()
-        except:
-            pass
-        
-        try:
-            # Create rss table
-            self.client.table('mltb_rss').select('*').limit(1).execute()
-        except:
-            pass
-            
-        try:
-            # Create tasks table
-            self.client.table('mltb_tasks').select('*').limit(1).execute()
-        except:
-            pass
+    def _check_connection(self):
+        """Probe the settings table once, the tables themselves are created by
+        supabase_schema.sql and errors here mean a bad URL, key or schema"""
+        self.client.table('mltb_settings').select('bot_id').limit(1).execute()
 
     @run_sync
     def _upsert_setting(self, category: str, data: dict):
@@ -86,7 +106,7 @@ class SupabaseDbManager:
         record = {
             'bot_id': self.bot_id,
             'category': category,
-            'data': json.dumps(data)
+            'data': _enc(data)
         }
         
         # Try to update first, if no rows affected, insert
@@ -104,16 +124,57 @@ class SupabaseDbManager:
         ).eq('category', category).execute()
         
         if result.data:
-            return json.loads(result.data[0]['data'])
+            return _dec(result.data[0]['data'])
         return {}
 
+    async def _get_cached_setting(self, category: str):
+        """Get a settings row, Supabase is only queried on first use"""
+        data = self._settings_cache.get(category)
+        if data is None:
+            data = self._settings_cache[category] = await self._get_setting(category)
+        return data
+
+    @run_sync
+    def _upload_file(self, object_path: str, path: str):
+        """Stream a local file into the Storage bucket, replacing the old object"""
+        with open(path, "rb") as f:
+            return self.client.storage.from_(STORAGE_BUCKET).upload(
+                object_path,
+                f,
+                {"upsert": "true", "content-type": "application/octet-stream"}
+            )
+
+    @run_sync
+    def _remove_file(self, object_path: str):
+        """Remove an object from the Storage bucket"""
+        return self.client.storage.from_(STORAGE_BUCKET).remove([object_path])
+
+    @run_sync
+    def _b64_file(self, path: str):
+        """Base64 encode a file chunk by chunk, off the event loop"""
+        parts = []
+        with open(path, "rb") as f:
+            while chunk := f.read(B64_CHUNK_SIZE):
+                parts.append(base64.b64encode(chunk).decode('ascii'))
+        return "".join(parts)
+
+    async def _store_file(self, db_path: str, path: str):
+        """Upload a private file and return the value kept in its settings row,
+        inline base64 is only used while Storage is unavailable"""
+        object_path = f"{self.bot_id}/{db_path}"
+        try:
+            await self._upload_file(object_path, path)
+            return {'storage_path': object_path}
+        except Exception as e:
+            LOGGER.warning(f"Storage upload of {db_path} failed, storing it inline: {e}")
+        return await self._b64_file(path)
+
     async def update_deploy_config(self):
         """Update deployment configuration"""
         if self._return:
             return
         
         try:
-            from importlib import import_module
             settings = import_module("config")
             config_file = {
                 key: value.strip() if isinstance(value, str) else value
@@ -140,7 +201,7 @@ class SupabaseDbManager:
             return
         
         try:
-            current_config = await self._get_setting('aria2c')
+            current_config = await self._get_cached_setting('aria2c')
             current_config[key] = value
             await self._upsert_setting('aria2c', current_config)
         except Exception as e:
@@ -152,7 +213,7 @@ class SupabaseDbManager:
             return
         
         try:
-            current_config = await self._get_setting('qbittorrent')
+            current_config = await self._get_cached_setting('qbittorrent')
             current_config[key] = value
             await self._upsert_setting('qbittorrent', current_config)
         except Exception as e:
@@ -165,6 +226,8 @@ class SupabaseDbManager:
         
         try:
             await self._upsert_setting('qbittorrent', qbit_options)
+            # The whole row was replaced, re-read it on the next key update
+            self._settings_cache.pop('qbittorrent', None)
         except Exception as e:
             LOGGER.error(f"Error saving qBittorrent settings in Supabase: {e}")
 
@@ -174,17 +237,15 @@ class SupabaseDbManager:
             return
         
         try:
-            current_files = await self._get_setting('files')
+            current_files = await self._get_cached_setting('files')
             db_path = path.replace(".", "__")
             
             if await aiopath.exists(path):
-                async with aiopen(path, "rb") as pf:
-                    pf_bin = await pf.read()
-                    # Convert binary to base64 for JSON storage
-                    import base64
-                    current_files[db_path] = base64.b64encode(pf_bin).decode('utf-8')
+                current_files[db_path] = await self._store_file(db_path, path)
             else:
-                current_files.pop(db_path, None)
+                stored = current_files.pop(db_path, None)
+                if isinstance(stored, dict):
+                    await self._remove_file(stored['storage_path'])
             
             await self._upsert_setting('files', current_files)
             
@@ -200,11 +261,12 @@ class SupabaseDbManager:
             return
         
         try:
-            async with aiopen("sabnzbd/SABnzbd.ini", "rb") as pf:
-                nzb_conf = await pf.read()
-                import base64
-                config_data = {"SABnzbd__ini": base64.b64encode(nzb_conf).decode('utf-8')}
-                await self._upsert_setting('nzb', config_data)
+            config_data = {
+                "SABnzbd__ini": await self._store_file(
+                    "SABnzbd__ini", "sabnzbd/SABnzbd.ini"
+                )
+            }
+            await self._upsert_setting('nzb', config_data)
         except Exception as e:
             LOGGER.error(f"Error updating NZB config in Supabase: {e}")
 
@@ -214,7 +276,7 @@ class SupabaseDbManager:
         record = {
             'bot_id': self.bot_id,
             'user_id': str(user_id),
-            'data': json.dumps(data)
+            'data': _enc(data)
         }
         
         result = self.client.table('mltb_users').upsert(
@@ -229,10 +291,10 @@ class SupabaseDbManager:
             return
         
         try:
-            data = user_data.get(user_id, {}).copy()
-            # Remove binary data that needs special handling
-            for key in ("THUMBNAIL", "RCLONE_CONFIG", "TOKEN_PICKLE"):
-                data.pop(key, None)
+            data = {
+                k: v for k, v in user_data.get(user_id, {}).items()
+                if k not in _EXCLUDE
+            }
             
             await self._upsert_user(user_id, data)
         except Exception as e:
@@ -248,10 +310,7 @@ class SupabaseDbManager:
             result = await self._get_user_data(user_id)
             
             if path:
-                async with aiopen(path, "rb") as doc:
-                    doc_bin = await doc.read()
-                    import base64
-                    result[key] = base64.b64encode(doc_bin).decode('utf-8')
+                result[key] = await self._b64_file(path)
             else:
                 result.pop(key, None)
             
@@ -267,7 +326,7 @@ class SupabaseDbManager:
         ).eq('user_id', str(user_id)).execute()
         
         if result.data:
-            return json.loads(result.data[0]['data'])
+            return _dec(result.data[0]['data'])
         return {}
 
     @run_sync
@@ -276,7 +335,7 @@ class SupabaseDbManager:
         record = {
             'bot_id': self.bot_id,
             'user_id': str(user_id),
-            'data': json.dumps(data)
+            'data': _enc(data)
         }
         
         result = self.client.table('mltb_rss').upsert(
@@ -285,6 +344,15 @@ class SupabaseDbManager:
         ).execute()
         return result
 
+    @run_sync
+    def _upsert_rss_bulk(self, records: list):
+        """Upsert RSS data of many users in one request"""
+        result = self.client.table('mltb_rss').upsert(
+            records,
+            on_conflict='bot_id,user_id'
+        ).execute()
+        return result
+
     @run_sync
     def _delete_rss(self, user_id: int):
         """Delete RSS data"""
@@ -299,10 +367,34 @@ class SupabaseDbManager:
             return
         
         try:
-            for user_id in list(rss_dict.keys()):
-                await self._upsert_rss(user_id, rss_dict[user_id])
+            records = [
+                {
+                    'bot_id': self.bot_id,
+                    'user_id': str(user_id),
+                    'data': _enc(data)
+                }
+                for user_id, data in list(rss_dict.items())
+            ]
+            if records:
+                await self._upsert_rss_bulk(records)
         except Exception as e:
             LOGGER.error(f"Error updating all RSS in Supabase: {e}")
+            # Fall back to one request per user, run concurrently
+            await self._rss_update_each()
+
+    async def _rss_update_each(self):
+        """Upsert RSS data user by user, bounded by the RSS semaphore"""
+        async def _one(user_id):
+            async with self._rss_sem:
+                await self._upsert_rss(user_id, rss_dict[user_id])
+
+        user_ids = list(rss_dict.keys())
+        results = await asyncio.gather(
+            *(_one(user_id) for user_id in user_ids), return_exceptions=True
+        )
+        for user_id, result in zip(user_ids, results):
+            if isinstance(result, Exception):
+                LOGGER.error(f"Error updating RSS of {user_id} in Supabase: {result}")
 
     async def rss_update(self, user_id):
         """Update RSS data for specific user"""
@@ -390,18 +482,10 @@ class SupabaseDbManager:
         try:
             tasks = await self._get_all_tasks()
             
+            grouped = defaultdict(lambda: defaultdict(list))
             for task in tasks:
-                cid = task['cid']
-                tag = task['tag']
-                task_id = task['task_id']
-                
-                if cid in notifier_dict:
-                    if tag in notifier_dict[cid]:
-                        notifier_dict[cid][tag].append(task_id)
-                    else:
-                        notifier_dict[cid][tag] = [task_id]
-                else:
-                    notifier_dict[cid] = {tag: [task_id]}
+                grouped[task['cid']][task['tag']].append(task['task_id'])
+            notifier_dict = {cid: dict(tags) for cid, tags in grouped.items()}
             
             # Clear all tasks after retrieving
             await self._clear_all_tasks()
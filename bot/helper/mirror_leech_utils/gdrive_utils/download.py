@@ -1,8 +1,15 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from google_auth_httplib2 import Request as AuthRequest
 from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaIoBaseDownload
+from googleapiclient.http import MediaDownloadProgress, MediaIoBaseDownload
+from httplib2 import Response
+from httpx import Client, Timeout
 from io import FileIO
+from json import JSONDecodeError, loads
 from logging import getLogger
-from os import makedirs, path as ospath
+from os import makedirs, path as ospath, scandir
+from queue import Queue
+from threading import Lock, Thread, local
 from tenacity import (
     retry,
     wait_exponential,
@@ -11,28 +18,214 @@ from tenacity import (
     RetryError,
 )
 
+from ....core.config_manager import Config
 from ...ext_utils.bot_utils import async_to_sync
 from ...ext_utils.bot_utils import SetInterval
-from ...ext_utils.hash_utils import hash_db
+from ...ext_utils.hash_utils import get_hash_db
 from ...ext_utils.status_utils import get_readable_file_size
 from ...mirror_leech_utils.gdrive_utils.helper import GoogleDriveHelper
 
 LOGGER = getLogger(__name__)
 
+# Used when GDRIVE_DOWNLOAD_CHUNK_SIZE is unset, each chunk of the legacy
+# download is one HTTP request and is held in memory until written
+DEFAULT_CHUNK_SIZE = 256 * 1024 * 1024
+# Used when GDRIVE_DOWNLOAD_WORKERS is unset
+DEFAULT_DOWNLOAD_WORKERS = 4
+# Read size of the streamed download, cancellation is checked between reads
+STREAM_BUFFER_SIZE = 16 * 1024 * 1024
+# Streamed reads waiting for the writer thread before the download blocks
+WRITE_QUEUE_SIZE = 4
+
+
+def _log_callback_error(future):
+    if not future.cancelled() and (err := future.exception()) is not None:
+        LOGGER.error(f"Error in on_download_error: {err}")
+
+
+class _StreamedDownload:
+    """Stand-in for MediaIoBaseDownload that reads the media of a Drive
+    request from one streamed response instead of a ranged request per chunk.
+    Failed responses are raised as HttpError so both share error handling,
+    a retried call resumes with a Range request from the bytes written.
+    Chunks are written by a separate thread so disk writes overlap reads."""
+
+    def __init__(self, client, fh, request):
+        self._client = client
+        self._fh = fh
+        self._request = request
+        self._response = None
+        self._chunks = None
+        self._progress = 0
+        self._total_size = None
+        self._queue = Queue(maxsize=WRITE_QUEUE_SIZE)
+        self._writer = None
+        self._write_error = None
+
+    def _open(self):
+        request = self._request
+        headers = dict(request.headers)
+        # Adds the bearer token, refreshing the credentials when expired
+        request.http.credentials.before_request(
+            AuthRequest(request.http.http), "GET", request.uri, headers
+        )
+        if self._progress:
+            headers["range"] = f"bytes={self._progress}-"
+        response = self._client.send(
+            self._client.build_request("GET", request.uri, headers=headers),
+            stream=True,
+        )
+        if response.status_code >= 400:
+            content = response.read()
+            response.close()
+            resp = Response(dict(response.headers))
+            resp.status = response.status_code
+            raise HttpError(resp, content, uri=request.uri)
+        if self._progress and response.status_code != 206:
+            # The range was ignored and the whole file is sent again
+            self._flush()
+            self._fh.seek(0)
+            self._fh.truncate()
+            self._progress = 0
+        if (length := response.headers.get("content-length")) is not None:
+            self._total_size = self._progress + int(length)
+        self._response = response
+        self._chunks = response.iter_bytes(STREAM_BUFFER_SIZE)
+
+    def next_chunk(self):
+        if self._response is None:
+            self._open()
+        try:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self._flush()
+            else:
+                self._put(chunk)
+        except BaseException:
+            self._close_response()
+            raise
+        if chunk is None:
+            self.close()
+            return MediaDownloadProgress(self._progress, self._progress), True
+        self._progress += len(chunk)
+        return MediaDownloadProgress(self._progress, self._total_size), False
+
+    def _write(self):
+        while (chunk := self._queue.get()) is not None:
+            if self._write_error is None:
+                try:
+                    self._fh.write(chunk)
+                except Exception as e:
+                    self._write_error = e
+            self._queue.task_done()
+
+    def _put(self, chunk):
+        if self._write_error is not None:
+            raise self._write_error
+        if self._writer is None:
+            self._writer = Thread(target=self._write, daemon=True)
+            self._writer.start()
+        # Blocks while the writer is WRITE_QUEUE_SIZE chunks behind
+        self._queue.put(chunk)
+
+    def _flush(self):
+        """Wait until the queued chunks are written"""
+        if self._writer is not None:
+            self._queue.join()
+        if self._write_error is not None:
+            raise self._write_error
+
+    def _close_response(self):
+        if self._response is not None:
+            self._response.close()
+            self._response = None
+
+    def close(self):
+        """Close the response and stop the writer thread"""
+        self._close_response()
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+
 
 class GoogleDriveDownload(GoogleDriveHelper):
     def __init__(self, listener, path):
         self.listener = listener
         self._updater = None
         self._path = path
+        # Folder files are downloaded by a thread pool, every thread keeps its
+        # own Drive client and progress is summed under a lock
+        self._thread_data = local()
+        self._progress_lock = Lock()
+        # Guards the shared service account counters, every switch bumps the
+        # generation so all threads drop the client of the old account
+        self._sa_lock = Lock()
+        self._sa_generation = 0
+        # Shared by the download threads, closed when the task ends
+        self._http_client = None
+        # Set when a failed folder download cancelled the task to stop its
+        # workers
+        self._aborted_by_error = False
         super().__init__()
         self.is_downloading = True
 
+    @property
+    def service(self):
+        """Drive client of the calling thread, httplib2 is not thread safe"""
+        data = self._thread_data
+        if (
+            getattr(data, "service", None) is None
+            or data.generation != self._sa_generation
+        ):
+            with self._sa_lock:
+                data.generation = self._sa_generation
+                data.service = self.authorize()
+        return data.service
+
+    @service.setter
+    def service(self, value):
+        self._thread_data.service = value
+        self._thread_data.generation = self._sa_generation
+
+    def switch_service_account(self):
+        """Move all download threads to the next service account, returns
+        False when every account was tried. A thread whose account was
+        already replaced by another thread only picks up the new one."""
+        data = self._thread_data
+        with self._sa_lock:
+            if getattr(data, "generation", None) != self._sa_generation:
+                return True
+            if self.sa_count >= self.sa_number:
+                return False
+            if self.sa_index == self.sa_number - 1:
+                self.sa_index = 0
+            else:
+                self.sa_index += 1
+            self.sa_count += 1
+            self._sa_generation += 1
+            LOGGER.info(f"Switching to {self.sa_index} index")
+        return True
+
+    async def progress(self):
+        # proc_bytes is advanced by the downloading threads after every chunk
+        self.total_time += self.update_interval
+
     def download(self):
         file_id = self.get_id_from_url(self.listener.link, self.listener.user_id)
         self.service = self.authorize()
         self._updater = SetInterval(self.update_interval, self.progress)
+        if not Config.GDRIVE_LEGACY_DOWNLOAD and self._http_client is None:
+            self._http_client = Client(
+                timeout=Timeout(60, connect=30), follow_redirects=True
+            )
         try:
+            # A file id seen before is answered from the hash database alone,
+            # without a metadata request to Drive
+            existing_file = get_hash_db().check_duplicate_by_file_id(file_id)
+            if existing_file:
+                return self._on_already_processed(file_id, existing_file)
+
             meta = self.get_file_metadata_with_hash(file_id)
             
             # Check for hash-based duplicates before downloading
@@ -46,7 +239,11 @@ class GoogleDriveDownload(GoogleDriveHelper):
             else:
                 makedirs(self._path, exist_ok=True)
                 self._download_file(
-                    file_id, self._path, self.listener.name, meta.get("mimeType")
+                    file_id,
+                    self._path,
+                    self.listener.name,
+                    meta.get("mimeType"),
+                    meta=meta,
                 )
         except Exception as err:
             if isinstance(err, RetryError):
@@ -61,26 +258,67 @@ class GoogleDriveDownload(GoogleDriveHelper):
                     self.use_sa = False
                     LOGGER.error("File not found. Trying with token.pickle...")
                     self._updater.cancel()
+                    # Only undo the stop of a failed folder download, not a
+                    # cancel by the user
+                    if self._aborted_by_error:
+                        self._aborted_by_error = False
+                        self.listener.is_cancelled = False
                     return self.download()
                 err = "File not found!"
-            async_to_sync(self.listener.on_download_error, err)
+            self._on_download_error(err)
             self.listener.is_cancelled = True
         finally:
             self._updater.cancel()
+            if self._http_client is not None:
+                self._http_client.close()
+                self._http_client = None
+            # Queued hash rows are stored before the task is reported
+            get_hash_db().flush()
             if self.listener.is_cancelled:
                 return
             async_to_sync(self.listener.on_download_complete)
             return
 
     def _download_folder(self, folder_id, path, folder_name):
+        pool = ThreadPoolExecutor(
+            max_workers=Config.GDRIVE_DOWNLOAD_WORKERS or DEFAULT_DOWNLOAD_WORKERS,
+            thread_name_prefix="gdrive_download",
+        )
+        futures = []
+        # Built once for the whole walk instead of once per file
+        self._excluded_extensions = tuple(self.listener.excluded_extensions)
+        try:
+            # Files start downloading while the remaining folders are listed
+            self._queue_folder(pool, futures, folder_id, path, folder_name)
+            for future in as_completed(futures):
+                future.result()
+                if self.listener.is_cancelled:
+                    break
+        except BaseException:
+            # Running workers stop at their next chunk, cancelled before
+            # download() reports the error and the listener cleans up
+            self._aborted_by_error = not self.listener.is_cancelled
+            self.listener.is_cancelled = True
+            raise
+        finally:
+            # Waits for the running workers, so none of them still writes
+            # or uses the http client once download() goes on
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _queue_folder(self, pool, futures, folder_id, path, folder_name):
         folder_name = folder_name.replace("/", "")
-        if not ospath.exists(f"{path}/{folder_name}"):
-            makedirs(f"{path}/{folder_name}")
-        path += f"/{folder_name}"
+        path = ospath.join(path, folder_name)
+        makedirs(path, exist_ok=True)
         result = self.get_files_by_folder_id(folder_id)
         if len(result) == 0:
             return
-        result = sorted(result, key=lambda k: k["name"])
+        # Files left by an earlier attempt and names already queued, one
+        # directory scan instead of a stat per listed file
+        with scandir(path) as entries:
+            existing = {entry.name for entry in entries if entry.is_file()}
+        # Listed already sorted by Drive with orderBy="folder, name"
+        # One bulk lookup for the whole folder instead of several per file
+        duplicates = self._find_duplicates_in_folder(result)
         for item in result:
             file_id = item["id"]
             filename = item["name"]
@@ -91,17 +329,32 @@ class GoogleDriveDownload(GoogleDriveHelper):
             else:
                 mime_type = item.get("mimeType")
             if mime_type == self.G_DRIVE_DIR_MIME_TYPE:
-                self._download_folder(file_id, path, filename)
-            elif not ospath.isfile(
-                f"{path}/{filename}"
-            ) and not filename.strip().lower().endswith(
-                tuple(self.listener.excluded_extensions)
+                self._queue_folder(pool, futures, file_id, path, filename)
+            elif filename not in existing and not filename.strip().lower().endswith(
+                self._excluded_extensions
             ):
                 # Check for duplicates before downloading individual files in folder
-                if self._should_skip_file_in_folder(item):
+                if (
+                    item["id"] in duplicates
+                    or item.get("md5Checksum") in duplicates
+                    or item.get("sha1Checksum") in duplicates
+                ):
                     LOGGER.info(f"Skipping duplicate file in folder: {filename}")
                     continue
-                self._download_file(file_id, path, filename, mime_type)
+                # A shortcut's listing entry describes the shortcut, not its target
+                futures.append(
+                    pool.submit(
+                        self._download_file,
+                        file_id,
+                        path,
+                        filename,
+                        mime_type,
+                        meta=item if shortcut_details is None else None,
+                    )
+                )
+                # Drive allows several items with one name, only the first is
+                # downloaded so no two workers write the same path
+                existing.add(filename)
             if self.listener.is_cancelled:
                 break
 
@@ -110,7 +363,9 @@ class GoogleDriveDownload(GoogleDriveHelper):
         stop=stop_after_attempt(3),
         retry=retry_if_exception_type(Exception),
     )
-    def _download_file(self, file_id, path, filename, mime_type, export=False):
+    def _download_file(
+        self, file_id, path, filename, mime_type, export=False, meta=None
+    ):
         if export:
             request = self.service.files().export_media(
                 fileId=file_id, mimeType="application/pdf"
@@ -130,140 +385,185 @@ class GoogleDriveDownload(GoogleDriveHelper):
                 self.listener.name = filename
         if self.listener.is_cancelled:
             return
-        fh = FileIO(f"{path}/{filename}", "wb")
-        downloader = MediaIoBaseDownload(fh, request, chunksize=100 * 1024 * 1024)
+        file_path = ospath.join(path, filename)
+        fh = FileIO(file_path, "wb")
+        if self._http_client is not None:
+            downloader = _StreamedDownload(self._http_client, fh, request)
+        else:
+            downloader = MediaIoBaseDownload(
+                fh,
+                request,
+                chunksize=Config.GDRIVE_DOWNLOAD_CHUNK_SIZE or DEFAULT_CHUNK_SIZE,
+            )
         done = False
         retries = 0
-        while not done:
-            if self.listener.is_cancelled:
-                fh.close()
-                break
-            try:
-                self.status, done = downloader.next_chunk()
-            except HttpError as err:
-                LOGGER.error(err)
-                if err.resp.status in [500, 502, 503, 504, 429] and retries < 10:
-                    retries += 1
-                    continue
-                if err.resp.get("content-type", "").startswith("application/json"):
-                    reason = (
-                        eval(err.content).get("error").get("errors")[0].get("reason")
-                    )
-                    if "fileNotDownloadable" in reason and "document" in mime_type:
-                        return self._download_file(
-                            file_id, path, filename, mime_type, True
-                        )
-                    if reason not in [
-                        "downloadQuotaExceeded",
-                        "dailyLimitExceeded",
-                    ]:
-                        raise err
-                    if self.use_sa:
-                        if self.sa_count >= self.sa_number:
-                            LOGGER.info(
-                                f"Reached maximum number of service accounts switching, which is {self.sa_count}"
+        file_bytes = 0
+        try:
+            while not done:
+                if self.listener.is_cancelled:
+                    break
+                try:
+                    status, done = downloader.next_chunk()
+                    self._add_progress(status.resumable_progress - file_bytes)
+                    file_bytes = status.resumable_progress
+                except HttpError as err:
+                    LOGGER.error(err)
+                    if err.resp.status in [500, 502, 503, 504, 429] and retries < 10:
+                        retries += 1
+                        continue
+                    if err.resp.get("content-type", "").startswith("application/json"):
+                        try:
+                            reason = (
+                                loads(err.content.decode("utf-8", "replace"))
+                                .get("error")
+                                .get("errors")[0]
+                                .get("reason")
                             )
+                        except JSONDecodeError:
                             raise err
-                        else:
-                            if self.listener.is_cancelled:
-                                return
-                            self.switch_service_account()
-                            LOGGER.info(f"Got: {reason}, Trying Again...")
+                        if "fileNotDownloadable" in reason and "document" in mime_type:
+                            self._add_progress(-file_bytes)
+                            file_bytes = 0
                             return self._download_file(
-                                file_id, path, filename, mime_type
+                                file_id, path, filename, mime_type, True, meta
                             )
-                    else:
-                        LOGGER.error(f"Got: {reason}")
-                        raise err
+                        if reason not in [
+                            "downloadQuotaExceeded",
+                            "dailyLimitExceeded",
+                        ]:
+                            raise err
+                        if self.use_sa:
+                            if self.listener.is_cancelled:
+                                return
+                            if not self.switch_service_account():
+                                LOGGER.info(
+                                    f"Reached maximum number of service accounts switching, which is {self.sa_count}"
+                                )
+                                raise err
+                            else:
+                                LOGGER.info(f"Got: {reason}, Trying Again...")
+                                self._add_progress(-file_bytes)
+                                file_bytes = 0
+                                return self._download_file(
+                                    file_id, path, filename, mime_type, meta=meta
+                                )
+                        else:
+                            LOGGER.error(f"Got: {reason}")
+                            raise err
+        except Exception:
+            # A retried attempt counts the file again from the start
+            self._add_progress(-file_bytes)
+            raise
+        finally:
+            if isinstance(downloader, _StreamedDownload):
+                downloader.close()
+        fh.close()
         
         # Add successfully downloaded file to hash database
         if not self.listener.is_cancelled:
             try:
-                meta = self.get_file_metadata_with_hash(file_id)
-                hash_db.add_file_hash(
+                # Callers pass the metadata they already fetched or listed
+                if meta is None:
+                    meta = self.get_file_metadata_with_hash(file_id)
+                # Written in batches by the hash database's queue thread
+                get_hash_db().queue_file_hash(
                     file_id=file_id,
                     file_name=filename,
                     file_size=meta.get("size", 0),
                     md5_hash=meta.get("md5Checksum"),
                     sha1_hash=meta.get("sha1Checksum"),
                     mime_type=mime_type,
-                    file_path=f"{path}/{filename}"
+                    file_path=file_path
                 )
-                LOGGER.info(f"Added file to hash database: {filename}")
+                LOGGER.info(f"Queued file for hash database: {filename}")
             except Exception as e:
                 LOGGER.error(f"Failed to add file to hash database: {e}")
+
+    def _on_download_error(self, msg):
+        """Schedule the listener's error handler on the bot loop, the download
+        thread does not wait for the message to be sent"""
+        async_to_sync(
+            self.listener.on_download_error, msg, wait=False
+        ).add_done_callback(_log_callback_error)
+
+    def _add_progress(self, size):
+        with self._progress_lock:
+            self.proc_bytes += size
+
+    def _on_already_processed(self, file_id, existing_file):
+        """Cancel the download of a file id that is already in the hash database"""
+        file_name = existing_file['file_name'] or "Unknown"
+        file_size = int(existing_file['file_size'] or 0)
+        LOGGER.info(f"File already in database: {file_name}")
+        existing_drive_link = self.G_DRIVE_BASE_DOWNLOAD_URL.format(file_id)
+        
+        parts = [f"🔄 <b>File Already Processed!</b>\n\n"]
+        parts.append(f"📁 <b>File:</b> <a href='{existing_drive_link}'>{file_name}</a>\n")
+        parts.append(f"💾 <b>Size:</b> {get_readable_file_size(file_size)}\n")
+        parts.append(f"📅 <b>Previously processed:</b> {existing_file['download_date']}\n")
+        
+        if existing_file['file_path']:
+            parts.append(f"📂 <b>Local path:</b> <code>{existing_file['file_path']}</code>\n")
+        
+        parts.append(f"\n💡 <b>Click the link above to access your file directly!</b>\n")
+        parts.append("🚫 <b>Download cancelled - file already processed.</b>")
         
-        self.file_processed_bytes = 0
+        self._on_download_error("".join(parts))
+        self.listener.is_cancelled = True
+        return True
 
     def _check_duplicate_before_download(self, file_id, meta):
         """Check if file is duplicate based on hash before starting download"""
         try:
             md5_hash = meta.get("md5Checksum")
             sha1_hash = meta.get("sha1Checksum")
+            # Docs and other files without a Drive checksum cannot match by hash,
+            # the file id was already checked
+            if not md5_hash and not sha1_hash:
+                return False
             file_name = meta.get("name", "Unknown")
             file_size = int(meta.get("size", 0))
             
-            # Check if this exact file ID was already processed
-            existing_file = hash_db.check_duplicate_by_file_id(file_id)
-            if existing_file:
-                LOGGER.info(f"File already in database: {file_name}")
-                existing_drive_link = self.G_DRIVE_BASE_DOWNLOAD_URL.format(file_id)
-                
-                msg = f"🔄 <b>File Already Processed!</b>\n\n"
-                msg += f"📁 <b>File:</b> <a href='{existing_drive_link}'>{file_name}</a>\n"
-                msg += f"💾 <b>Size:</b> {get_readable_file_size(file_size)}\n"
-                msg += f"📅 <b>Previously processed:</b> {existing_file['download_date']}\n"
-                
-                if existing_file['file_path']:
-                    msg += f"📂 <b>Local path:</b> <code>{existing_file['file_path']}</code>\n"
-                
-                msg += f"\n💡 <b>Click the link above to access your file directly!</b>\n"
-                msg += "🚫 <b>Download cancelled - file already processed.</b>"
-                
-                async_to_sync(self.listener.on_download_error, msg)
-                self.listener.is_cancelled = True
-                return True
-            
             # Check for hash-based duplicates
             duplicates = []
             if md5_hash:
-                duplicates = hash_db.check_duplicate_by_hash(md5_hash=md5_hash)
+                duplicates = get_hash_db().check_duplicate_by_hash(md5_hash=md5_hash)
             elif sha1_hash:
-                duplicates = hash_db.check_duplicate_by_hash(sha1_hash=sha1_hash)
+                duplicates = get_hash_db().check_duplicate_by_hash(sha1_hash=sha1_hash)
             
             if duplicates:
                 LOGGER.info(f"Hash-based duplicate found for: {file_name}")
                 
-                # Get the most recent duplicate for the link
-                most_recent_dup = max(duplicates, key=lambda x: x['download_date'])
+                # Rows come newest first from ORDER BY download_date DESC
+                most_recent_dup = duplicates[0]
                 duplicate_drive_link = self.G_DRIVE_BASE_DOWNLOAD_URL.format(most_recent_dup['file_id'])
                 
-                msg = f"🔄 <b>Duplicate File Found!</b>\n\n"
-                msg += f"📁 <b>Requested File:</b> {file_name}\n"
-                msg += f"💾 <b>Size:</b> {get_readable_file_size(file_size)}\n\n"
+                parts = [f"🔄 <b>Duplicate File Found!</b>\n\n"]
+                parts.append(f"📁 <b>Requested File:</b> {file_name}\n")
+                parts.append(f"💾 <b>Size:</b> {get_readable_file_size(file_size)}\n\n")
                 
-                msg += f"✅ <b>Available Duplicate:</b> <a href='{duplicate_drive_link}'>{most_recent_dup['file_name']}</a>\n"
-                msg += f"📅 <b>Previously processed:</b> {most_recent_dup['download_date']}\n"
+                parts.append(f"✅ <b>Available Duplicate:</b> <a href='{duplicate_drive_link}'>{most_recent_dup['file_name']}</a>\n")
+                parts.append(f"📅 <b>Previously processed:</b> {most_recent_dup['download_date']}\n")
                 
                 if md5_hash:
-                    msg += f"🔐 <b>MD5:</b> <code>{md5_hash[:16]}...{md5_hash[-8:]}</code>\n"
+                    parts.append(f"🔐 <b>MD5:</b> <code>{md5_hash[:16]}...{md5_hash[-8:]}</code>\n")
                 if sha1_hash:
-                    msg += f"🔐 <b>SHA1:</b> <code>{sha1_hash[:16]}...{sha1_hash[-8:]}</code>\n"
+                    parts.append(f"🔐 <b>SHA1:</b> <code>{sha1_hash[:16]}...{sha1_hash[-8:]}</code>\n")
                 
                 if len(duplicates) > 1:
-                    msg += f"\n<b>📋 All {len(duplicates)} duplicate(s):</b>\n"
+                    parts.append(f"\n<b>📋 All {len(duplicates)} duplicate(s):</b>\n")
                     for i, dup in enumerate(duplicates, 1):
                         dup_link = self.G_DRIVE_BASE_DOWNLOAD_URL.format(dup['file_id'])
-                        msg += f"\n{i}. <a href='{dup_link}'>{dup['file_name']}</a>\n"
-                        msg += f"   📅 {dup['download_date']}\n"
+                        parts.append(f"\n{i}. <a href='{dup_link}'>{dup['file_name']}</a>\n")
+                        parts.append(f"   📅 {dup['download_date']}\n")
                         if dup['file_path']:
-                            msg += f"   📂 {dup['file_path']}\n"
+                            parts.append(f"   📂 {dup['file_path']}\n")
                 
-                msg += f"\n💡 <b>Use the link above to access your file directly!</b>\n"
-                msg += "🚫 <b>Download cancelled to prevent duplicate storage.</b>"
+                parts.append(f"\n💡 <b>Use the link above to access your file directly!</b>\n")
+                parts.append("🚫 <b>Download cancelled to prevent duplicate storage.</b>")
                 
                 # Add the file to database even though we're not downloading
-                hash_db.add_file_hash(
+                get_hash_db().add_file_hash(
                     file_id=file_id,
                     file_name=file_name,
                     file_size=file_size,
@@ -273,7 +573,7 @@ class GoogleDriveDownload(GoogleDriveHelper):
                     file_path=None  # Not downloaded
                 )
                 
-                async_to_sync(self.listener.on_download_error, msg)
+                self._on_download_error("".join(parts))
                 self.listener.is_cancelled = True
                 return True
             
@@ -283,24 +583,18 @@ class GoogleDriveDownload(GoogleDriveHelper):
             LOGGER.error(f"Error checking duplicates: {e}")
             return False
 
-    def _should_skip_file_in_folder(self, item):
-        """Check if file in folder should be skipped due to duplication"""
+    def _find_duplicates_in_folder(self, items):
+        """Get the file ids and hashes of folder items that are already known"""
         try:
-            file_id = item["id"]
-            md5_hash = item.get("md5Checksum")
-            sha1_hash = item.get("sha1Checksum")
-            
-            # Check if file ID already exists
-            if hash_db.check_duplicate_by_file_id(file_id):
-                return True
-            
-            # Check hash-based duplicates
-            if md5_hash and hash_db.check_duplicate_by_hash(md5_hash=md5_hash):
-                return True
-            if sha1_hash and hash_db.check_duplicate_by_hash(sha1_hash=sha1_hash):
-                return True
-            
-            return False
+            file_ids, md5s, sha1s = [], [], []
+            for item in items:
+                file_ids.append(item["id"])
+                # Only files with a Drive checksum take part in the hash lookups
+                if md5_hash := item.get("md5Checksum"):
+                    md5s.append(md5_hash)
+                if sha1_hash := item.get("sha1Checksum"):
+                    sha1s.append(sha1_hash)
+            return get_hash_db().check_duplicates_bulk(file_ids, md5s, sha1s)
         except Exception as e:
-            LOGGER.error(f"Error checking file in folder: {e}")
-            return False
+            LOGGER.error(f"Error checking files in folder: {e}")
+            return set()
@@ -74,7 +74,9 @@ class GoogleDriveHelper:
         if self.use_sa:
             json_files = listdir("accounts")
             self.sa_number = len(json_files)
-            self.sa_index = randrange(self.sa_number)
+            # Random until the first switch, then the account switched to
+            if self.sa_count == 1:
+                self.sa_index = randrange(self.sa_number)
             LOGGER.info(f"Authorizing with {json_files[self.sa_index]} service account")
             credentials = service_account.Credentials.from_service_account_file(
                 f"accounts/{json_files[self.sa_index]}", scopes=self._OAUTH_SCOPE
@@ -2,7 +2,7 @@ from logging import getLogger
 
 from .... import drives_names, drives_ids, index_urls, user_data
 from ....helper.ext_utils.status_utils import get_readable_file_size
-from ....helper.ext_utils.hash_utils import hash_db
+from ....helper.ext_utils.hash_utils import get_hash_db
 from ....helper.mirror_leech_utils.gdrive_utils.helper import GoogleDriveHelper
 
 LOGGER = getLogger(__name__)
@@ -217,9 +217,9 @@ class GoogleDriveSearch(GoogleDriveHelper):
             # Check for duplicates
             duplicates = []
             if md5_hash:
-                duplicates = hash_db.check_duplicate_by_hash(md5_hash=md5_hash)
+                duplicates = get_hash_db().check_duplicate_by_hash(md5_hash=md5_hash)
             elif sha1_hash:
-                duplicates = hash_db.check_duplicate_by_hash(sha1_hash=sha1_hash)
+                duplicates = get_hash_db().check_duplicate_by_hash(sha1_hash=sha1_hash)
             
             # Return info if duplicates found (excluding current file)
             if duplicates:
@@ -58,6 +58,8 @@ state = "view"
 handler_dict = {}
 DEFAULT_VALUES = {
     "LEECH_SPLIT_SIZE": TgClient.MAX_SPLIT_SIZE,
+    "GDRIVE_DOWNLOAD_CHUNK_SIZE": 268435456,
+    "GDRIVE_DOWNLOAD_WORKERS": 4,
     "RSS_DELAY": 600,
     "STATUS_UPDATE_INTERVAL": 15,
     "SEARCH_LIMIT": 0,
@@ -3,8 +3,8 @@ from pyrogram import filters
 from pyrogram.handlers import MessageHandler
 
 from ..core.config_manager import Config
-from ..helper.ext_utils.bot_utils import new_task, sync_to_async
-from ..helper.ext_utils.hash_utils import hash_db
+from ..helper.ext_utils.bot_utils import new_task
+from ..helper.ext_utils.hash_utils import get_async_hash_db
 from ..helper.ext_utils.status_utils import get_readable_file_size
 from ..helper.telegram_helper.bot_commands import BotCommands
 from ..helper.telegram_helper.filters import CustomFilters
@@ -20,26 +20,26 @@ async def hash_stats(client, message):
         return
     
     try:
-        stats = await sync_to_async(hash_db.get_database_stats)
+        stats = await get_async_hash_db().get_database_stats()
         
         if not stats:
             await send_message(message, "❌ Failed to retrieve database statistics!")
             return
         
-        msg = "📊 <b>Hash Database Statistics</b>\n\n"
-        msg += f"📁 <b>Total Files:</b> {stats['total_files']:,}\n"
-        msg += f"💾 <b>Total Size:</b> {get_readable_file_size(stats['total_size'])}\n"
-        msg += f"🔄 <b>Duplicate Groups:</b> {stats['duplicate_groups']:,}\n"
-        msg += f"📋 <b>Duplicate Files:</b> {stats['duplicate_files']:,}\n"
-        msg += f"🗑️ <b>Wasted Space:</b> {get_readable_file_size(stats['wasted_space'])}\n"
-        msg += f"⚡ <b>Storage Efficiency:</b> {stats['efficiency']:.1f}%\n\n"
+        parts = ["📊 <b>Hash Database Statistics</b>\n\n"]
+        parts.append(f"📁 <b>Total Files:</b> {stats['total_files']:,}\n")
+        parts.append(f"💾 <b>Total Size:</b> {get_readable_file_size(stats['total_size'])}\n")
+        parts.append(f"🔄 <b>Duplicate Groups:</b> {stats['duplicate_groups']:,}\n")
+        parts.append(f"📋 <b>Duplicate Files:</b> {stats['duplicate_files']:,}\n")
+        parts.append(f"🗑️ <b>Wasted Space:</b> {get_readable_file_size(stats['wasted_space'])}\n")
+        parts.append(f"⚡ <b>Storage Efficiency:</b> {stats['efficiency']:.1f}%\n\n")
         
         if stats['wasted_space'] > 0:
-            msg += f"💡 <b>Space Savings:</b> {get_readable_file_size(stats['wasted_space'])} saved by avoiding duplicates!"
+            parts.append(f"💡 <b>Space Savings:</b> {get_readable_file_size(stats['wasted_space'])} saved by avoiding duplicates!")
         else:
-            msg += "✅ <b>No duplicates detected!</b> All files are unique."
+            parts.append("✅ <b>No duplicates detected!</b> All files are unique.")
         
-        await send_message(message, msg)
+        await send_message(message, "".join(parts))
         
     except Exception as e:
         await send_message(message, f"❌ Error retrieving statistics: {str(e)}")
@@ -69,28 +69,28 @@ async def hash_duplicates(client, message):
         if len(args) > 2 and args[2].lower() in ['md5', 'sha1']:
             hash_type = args[2].lower()
         
-        duplicate_groups = await sync_to_async(hash_db.get_duplicate_groups, hash_type, 2)
+        duplicate_groups = await get_async_hash_db().get_duplicate_groups(hash_type, 2)
         
         if not duplicate_groups:
             await send_message(message, f"✅ No duplicate groups found using {hash_type.upper()} hashes!")
             return
         
-        msg = f"🔄 <b>Duplicate Groups ({hash_type.upper()})</b>\n"
-        msg += f"📊 Showing top {min(limit, len(duplicate_groups))} groups\n\n"
+        parts = [f"🔄 <b>Duplicate Groups ({hash_type.upper()})</b>\n"]
+        parts.append(f"📊 Showing top {min(limit, len(duplicate_groups))} groups\n\n")
         
         for i, group in enumerate(duplicate_groups[:limit], 1):
-            msg += f"<b>{i}. Hash:</b> <code>{group['hash_value'][:16]}...{group['hash_value'][-8:]}</code>\n"
-            msg += f"   📁 Files: {group['file_count']}\n"
-            msg += f"   💾 Total Size: {get_readable_file_size(group['total_size'])}\n"
-            msg += f"   🗑️ Wasted: {get_readable_file_size(group['total_size'] - (group['total_size'] // group['file_count']))}\n\n"
+            parts.append(f"<b>{i}. Hash:</b> <code>{group['short_hash']}</code>\n")
+            parts.append(f"   📁 Files: {group['file_count']}\n")
+            parts.append(f"   💾 Total Size: {get_readable_file_size(group['total_size'])}\n")
+            parts.append(f"   🗑️ Wasted: {get_readable_file_size(group['total_size'] - (group['total_size'] // group['file_count']))}\n\n")
         
         if len(duplicate_groups) > limit:
-            msg += f"... and {len(duplicate_groups) - limit} more duplicate groups\n\n"
+            parts.append(f"... and {len(duplicate_groups) - limit} more duplicate groups\n\n")
         
-        msg += f"💡 <b>Usage:</b> <code>/{BotCommands.HashDuplicatesCommand} [limit] [hash_type]</code>\n"
-        msg += f"📝 <b>Example:</b> <code>/{BotCommands.HashDuplicatesCommand} 20 sha1</code>"
+        parts.append(f"💡 <b>Usage:</b> <code>/{BotCommands.HashDuplicatesCommand} [limit] [hash_type]</code>\n")
+        parts.append(f"📝 <b>Example:</b> <code>/{BotCommands.HashDuplicatesCommand} 20 sha1</code>")
         
-        await send_message(message, msg)
+        await send_message(message, "".join(parts))
         
     except Exception as e:
         await send_message(message, f"❌ Error retrieving duplicates: {str(e)}")
@@ -116,29 +116,29 @@ async def hash_details(client, message):
         if len(args) > 2 and args[2].lower() in ['md5', 'sha1']:
             hash_type = args[2].lower()
         
-        files = await sync_to_async(hash_db.get_files_by_hash, hash_value, hash_type)
+        files = await get_async_hash_db().get_files_by_hash(hash_value, hash_type)
         
         if not files:
             await send_message(message, f"❌ No files found with {hash_type.upper()} hash: <code>{hash_value}</code>")
             return
         
-        msg = f"🔍 <b>Files with {hash_type.upper()} Hash</b>\n"
-        msg += f"🔐 <code>{hash_value}</code>\n\n"
-        msg += f"📊 <b>Found {len(files)} file(s):</b>\n\n"
+        parts = [f"🔍 <b>Files with {hash_type.upper()} Hash</b>\n"]
+        parts.append(f"🔐 <code>{hash_value}</code>\n\n")
+        parts.append(f"📊 <b>Found {len(files)} file(s):</b>\n\n")
         
         for i, file in enumerate(files, 1):
             # Create Google Drive link
             drive_link = f"https://drive.google.com/uc?id={file['file_id']}&export=download"
             
-            msg += f"<b>{i}. <a href='{drive_link}'>{file['file_name']}</a></b>\n"
-            msg += f"   📁 ID: <code>{file['file_id']}</code>\n"
-            msg += f"   💾 Size: {get_readable_file_size(file['file_size'])}\n"
-            msg += f"   📅 Downloaded: {file['download_date']}\n"
+            parts.append(f"<b>{i}. <a href='{drive_link}'>{file['file_name']}</a></b>\n")
+            parts.append(f"   📁 ID: <code>{file['file_id']}</code>\n")
+            parts.append(f"   💾 Size: {get_readable_file_size(file['file_size'])}\n")
+            parts.append(f"   📅 Downloaded: {file['download_date']}\n")
             if file['file_path']:
-                msg += f"   📂 Path: <code>{file['file_path']}</code>\n"
-            msg += "\n"
+                parts.append(f"   📂 Path: <code>{file['file_path']}</code>\n")
+            parts.append("\n")
         
-        await send_message(message, msg)
+        await send_message(message, "".join(parts))
         
     except Exception as e:
         await send_message(message, f"❌ Error retrieving hash details: {str(e)}")
@@ -155,7 +155,7 @@ async def hash_cleanup(client, message):
     try:
         sent_msg = await send_message(message, "🔄 <b>Cleaning up hash database...</b>")
         
-        cleaned = await sync_to_async(hash_db.cleanup_orphaned_records)
+        cleaned = await get_async_hash_db().cleanup_orphaned_records()
         
         await edit_message(sent_msg, f"✅ <b>Database cleanup completed!</b>\n\n📊 Rebuilt {cleaned} duplicate groups.")
         
@@ -180,20 +180,20 @@ async def hash_remove(client, message):
         file_id = args[1]
         
         # Check if file exists
-        existing_file = await sync_to_async(hash_db.check_duplicate_by_file_id, file_id)
+        existing_file = await get_async_hash_db().check_duplicate_by_file_id(file_id)
         if not existing_file:
             await send_message(message, f"❌ File with ID <code>{file_id}</code> not found in database!")
             return
         
         # Remove the file
-        success = await sync_to_async(hash_db.remove_file_hash, file_id)
+        success = await get_async_hash_db().remove_file_hash(file_id)
         
         if success:
-            msg = f"✅ <b>File removed from database!</b>\n\n"
-            msg += f"📁 <b>File:</b> {existing_file['file_name']}\n"
-            msg += f"🔍 <b>ID:</b> <code>{file_id}</code>\n"
-            msg += f"💾 <b>Size:</b> {get_readable_file_size(existing_file['file_size'])}"
-            await send_message(message, msg)
+            parts = [f"✅ <b>File removed from database!</b>\n\n"]
+            parts.append(f"📁 <b>File:</b> {existing_file['file_name']}\n")
+            parts.append(f"🔍 <b>ID:</b> <code>{file_id}</code>\n")
+            parts.append(f"💾 <b>Size:</b> {get_readable_file_size(existing_file['file_size'])}")
+            await send_message(message, "".join(parts))
         else:
             await send_message(message, f"❌ Failed to remove file from database!")
         
@@ -221,32 +221,32 @@ async def hash_links(client, message):
         if len(args) > 2 and args[2].lower() in ['md5', 'sha1']:
             hash_type = args[2].lower()
         
-        files = await sync_to_async(hash_db.get_files_by_hash, hash_value, hash_type)
+        files = await get_async_hash_db().get_files_by_hash(hash_value, hash_type)
         
         if not files:
             await send_message(message, f"❌ No files found with {hash_type.upper()} hash: <code>{hash_value}</code>")
             return
         
-        msg = f"🔗 <b>Google Drive Links ({hash_type.upper()})</b>\n"
-        msg += f"🔐 <code>{hash_value}</code>\n\n"
+        parts = [f"🔗 <b>Google Drive Links ({hash_type.upper()})</b>\n"]
+        parts.append(f"🔐 <code>{hash_value}</code>\n\n")
         
         if len(files) == 1:
             file = files[0]
             drive_link = f"https://drive.google.com/uc?id={file['file_id']}&export=download"
-            msg += f"📁 <b><a href='{drive_link}'>{file['file_name']}</a></b>\n"
-            msg += f"💾 Size: {get_readable_file_size(file['file_size'])}\n"
-            msg += f"📅 Processed: {file['download_date']}"
+            parts.append(f"📁 <b><a href='{drive_link}'>{file['file_name']}</a></b>\n")
+            parts.append(f"💾 Size: {get_readable_file_size(file['file_size'])}\n")
+            parts.append(f"📅 Processed: {file['download_date']}")
         else:
-            msg += f"📊 <b>Found {len(files)} duplicate files:</b>\n\n"
+            parts.append(f"📊 <b>Found {len(files)} duplicate files:</b>\n\n")
             
             for i, file in enumerate(files, 1):
                 drive_link = f"https://drive.google.com/uc?id={file['file_id']}&export=download"
-                msg += f"{i}. <b><a href='{drive_link}'>{file['file_name']}</a></b>\n"
-                msg += f"   💾 {get_readable_file_size(file['file_size'])} | 📅 {file['download_date']}\n\n"
+                parts.append(f"{i}. <b><a href='{drive_link}'>{file['file_name']}</a></b>\n")
+                parts.append(f"   💾 {get_readable_file_size(file['file_size'])} | 📅 {file['download_date']}\n\n")
             
-            msg += "💡 <b>Click any link above to download the file directly!</b>"
+            parts.append("💡 <b>Click any link above to download the file directly!</b>")
         
-        await send_message(message, msg)
+        await send_message(message, "".join(parts))
         
     except Exception as e:
         await send_message(message, f"❌ Error retrieving links: {str(e)}")
@@ -4,7 +4,7 @@ from aiofiles.os import path as aiopath, remove
 from asyncio import gather, create_subprocess_exec
 from os import execl as osexecl
 
-from .. import intervals, scheduler, sabnzbd_client, LOGGER
+from .. import intervals, scheduler, sabnzbd_client, LOGGER, flush_logs
 from ..helper.ext_utils.bot_utils import new_task
 from ..helper.telegram_helper.message_utils import (
     send_message,
@@ -133,6 +133,7 @@ async def confirm_restart(_, query):
         await gather(proc1.wait(), proc2.wait())
         async with aiopen(".restartmsg", "w") as f:
             await f.write(f"{restart_message.chat.id}\n{restart_message.id}\n")
+        flush_logs()
         osexecl(executable, executable, "-m", "bot")
     else:
         await delete_message(message)
@@ -1,5 +1,6 @@
 from time import time
 
+from .. import log_file_handler
 from ..helper.ext_utils.bot_utils import new_task
 from ..helper.telegram_helper.button_build import ButtonMaker
 from ..helper.telegram_helper.message_utils import send_message, edit_message, send_file
@@ -39,4 +40,5 @@ async def ping(_, message):
 
 @new_task
 async def log(_, message):
+    log_file_handler.flush()
     await send_file(message, "log.txt")
@@ -10,6 +10,8 @@ CMD_SUFFIX = ""
 AUTHORIZED_CHATS = ""
 SUDO_USERS = ""
 DATABASE_URL = ""
+DATABASE_MAX_POOL_SIZE = 50
+DATABASE_MIN_POOL_SIZE = 5
 # Supabase Configuration
 SUPABASE_URL = ""
 SUPABASE_SERVICE_KEY = ""
@@ -27,6 +29,9 @@ FFMPEG_CMDS = {}
 UPLOAD_PATHS = {}
 # GDrive Tools
 GDRIVE_ID = ""
+GDRIVE_DOWNLOAD_CHUNK_SIZE = 268435456
+GDRIVE_DOWNLOAD_WORKERS = 4
+GDRIVE_LEGACY_DOWNLOAD = False
 IS_TEAM_DRIVE = False
 STOP_DUPLICATE = False
 INDEX_URL = ""
@@ -142,5 +142,10 @@ FROM mltb_tasks;
 -- Grant access to the view
 GRANT SELECT ON mltb_database_info TO service_role;
 
+-- Private bucket for uploaded private files (mltb_settings only keeps the path)
+INSERT INTO storage.buckets (id, name, public)
+VALUES ('mltb-files', 'mltb-files', false)
+ON CONFLICT (id) DO NOTHING;
+
 -- Success message
 SELECT 'Supabase schema for MLTBv2 Bot created successfully!' as status;
\ No newline at end of file